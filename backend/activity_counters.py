@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+from collections import defaultdict
+
+import metrics
+from blocking_io import run_blocking
+from storage import user_repository
+
+
+ACTIVITY_FLUSH_SECONDS = float(os.getenv("ACTIVITY_FLUSH_SECONDS", "5"))
+
+COUNTERS = ("chats", "pdfs", "tasks")
+
+
+class ActivityCounters:
+    """
+    Write-behind buffer for the per-user chats / PDFs / tasks counters.
+    increment() only touches memory; a background task flushes the summed
+    deltas every ACTIVITY_FLUSH_SECONDS with a single UPDATE ... FROM (VALUES ...).
+    Increments are atomic in SQL, so concurrent requests and workers never
+    overwrite each other. A failed flush keeps its deltas for the next one.
+    """
+
+    def __init__(self, flush_seconds: float = ACTIVITY_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._pending = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))   # google_id -> deltas
+        self._lock = threading.Lock()   # increment() may run on executor threads
+        self._task = None
+
+    def increment(self, google_id: str, chats: int = 0, pdfs: int = 0, tasks: int = 0):
+        if not google_id or not (chats or pdfs or tasks):
+            return
+        with self._lock:
+            deltas = self._pending[google_id]
+            deltas["chats"] += chats
+            deltas["pdfs"] += pdfs
+            deltas["tasks"] += tasks
+
+    def _take(self) -> dict:
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        return pending
+
+    def _restore(self, pending: dict):
+        with self._lock:
+            for google_id, deltas in pending.items():
+                for name in COUNTERS:
+                    self._pending[google_id][name] += deltas[name]
+
+    async def flush(self) -> int:
+        """Write everything buffered so far. Returns the number of users updated."""
+        pending = self._take()
+        if not pending:
+            return 0
+        rows = [
+            (google_id, deltas["chats"], deltas["pdfs"], deltas["tasks"])
+            for google_id, deltas in pending.items()
+        ]
+        try:
+            await run_blocking(user_repository.add_activity_counts, rows)
+        except Exception as e:
+            self._restore(pending)
+            metrics.increment("activity.flush_failures")
+            print(f"[Activity] Flush of {len(rows)} user(s) failed, will retry: {e}")
+            return 0
+        metrics.increment("activity.flushes")
+        metrics.observe("activity.flush_users", len(rows))
+        return len(rows)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def start(self):
+        """Spawn the flusher on the running event loop (call from app startup)"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the flusher and write out whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+
+activity_counters = ActivityCounters()
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+
+ANSWER_CACHE_DB_PATH = "db/memory.db"
+
+# Cosine similarity a new query needs to reuse a cached answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "900"))
+ANSWER_CACHE_ENTRIES_PER_USER = int(os.getenv("ANSWER_CACHE_ENTRIES_PER_USER", "64"))
+ANSWER_CACHE_MAX_USERS = int(os.getenv("ANSWER_CACHE_MAX_USERS", "1000"))
+# Trailing history messages a reply is keyed on, so "yes" / "tell me more"
+# only reuse an answer given after the same exchange
+ANSWER_CACHE_HISTORY_MESSAGES = int(os.getenv("ANSWER_CACHE_HISTORY_MESSAGES", "2"))
+
+
+def context_fingerprint(user_profile, google_items, content_version: int = 0) -> str:
+    """
+    Identifies the profile + Google data a reply was generated against, plus
+    the user's content version (AnswerCache.version()) for documents and memories
+    """
+    payload = json.dumps([user_profile, google_items, content_version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def history_key(chat_history: list, n: int = ANSWER_CACHE_HISTORY_MESSAGES) -> str:
+    """Identifies the last n messages of the conversation a query was asked in"""
+    recent = chat_history[-n:] if n else []
+    payload = json.dumps([[message.type, message.content] for message in recent])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _normalize(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """
+    Per-user semantic cache of chat replies.
+    A lookup hits when a previous query from the same user is within the
+    similarity threshold, hasn't expired, was answered against the same
+    context fingerprint (profile + Google data) and followed the same recent
+    history (history_key()). Entries with a different fingerprint are stale and
+    dropped; a different history just doesn't match. Users and their entries
+    are both evicted least-recently-used first.
+
+    Entries live in this process, but the per-user content version that goes
+    into the fingerprint is kept in SQLite (answer_cache_versions), so an
+    invalidate_user() in one worker retires the user's replies in every worker
+    on the instance.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS,
+        entries_per_user: int = ANSWER_CACHE_ENTRIES_PER_USER,
+        max_users: int = ANSWER_CACHE_MAX_USERS,
+        db_path: str = ANSWER_CACHE_DB_PATH,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.entries_per_user = entries_per_user
+        self.max_users = max_users
+        self._users = OrderedDict()   # user_id -> OrderedDict(entry_id -> entry)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self._conn = None
+        self._db_lock = threading.Lock()
+
+    # ==================== SHARED VERSION ====================
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        return self._conn
+
+    def version(self, user_id: str):
+        """The user's content version for context_fingerprint(), or None if it can't be read (skip the cache)"""
+        try:
+            with self._db_lock:
+                row = self._connection().execute(
+                    "SELECT version FROM answer_cache_versions WHERE user_id = ?", (user_id,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            metrics.increment("answer_cache.version_errors")
+            print(f"[AnswerCache] Version lookup failed: {e}")
+            return None
+        return row[0] if row else 0
+
+    # ==================== ENTRIES ====================
+
+    def lookup(self, user_id: str, query_embedding, fingerprint: str, history: str):
+        """Return the best cached entry ({"reply", "route", ...}) or None"""
+        query_vector = _normalize(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            entries = self._users.get(user_id)
+            if not entries:
+                metrics.increment("answer_cache.miss")
+                return None
+
+            # Drop anything stale or answered against different context
+            for entry_id in [
+                entry_id for entry_id, entry in entries.items()
+                if now - entry["created_at"] > self.ttl_seconds or entry["fingerprint"] != fingerprint
+            ]:
+                del entries[entry_id]
+
+            entry_ids = [entry_id for entry_id, entry in entries.items() if entry["history"] == history]
+            if not entry_ids:
+                metrics.increment("answer_cache.miss")
+                return None
+
+            matrix = np.stack([entries[entry_id]["embedding"] for entry_id in entry_ids])
+            similarities = matrix @ query_vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                metrics.increment("answer_cache.miss")
+                return None
+
+            entry_id = entry_ids[best]
+            entries.move_to_end(entry_id)
+            self._users.move_to_end(user_id)
+            metrics.increment("answer_cache.hit")
+            return entries[entry_id]
+
+    def store(self, user_id: str, query_embedding, fingerprint: str, history: str, reply: str, route: str):
+        with self._lock:
+            entries = self._users.setdefault(user_id, OrderedDict())
+            self._users.move_to_end(user_id)
+            self._next_id += 1
+            entries[self._next_id] = {
+                "embedding": _normalize(query_embedding),
+                "fingerprint": fingerprint,
+                "history": history,
+                "reply": reply,
+                "route": route,
+                "created_at": time.monotonic(),
+            }
+            while len(entries) > self.entries_per_user:
+                entries.popitem(last=False)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate_user(self, user_id: str):
+        """
+        Forget every cached reply for a user (new documents, memories, ...), in
+        this process and, through the shared version, in every other worker.
+        Blocking; run it off the event loop.
+        """
+        with self._lock:
+            self._users.pop(user_id, None)
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                conn.execute("""
+                    INSERT INTO answer_cache_versions (user_id, version) VALUES (?, 1)
+                    ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+                """, (user_id,))
+                conn.commit()
+        except sqlite3.Error as e:
+            # Other workers keep their entries until ANSWER_CACHE_TTL_SECONDS
+            metrics.increment("answer_cache.version_errors")
+            print(f"[AnswerCache] Version bump for user {user_id} failed: {e}")
+            return
+        metrics.increment("answer_cache.invalidations")
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,19 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Bounded pool for the blocking clients (psycopg2, Chroma, SQLite) so a slow
+# call never stalls the event loop for other users.
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "16"))
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_IO_WORKERS,
+    thread_name_prefix="blocking-io"
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the shared executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
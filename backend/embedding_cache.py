@@ -0,0 +1,227 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+import metrics
+from blocking_io import run_blocking
+
+load_dotenv()
+
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_CACHE_DB_PATH = "db/memory.db"
+# Vectors kept in process in front of SQLite (~6 KB each at 1536 float32 dims)
+EMBEDDING_CACHE_LRU_SIZE = int(os.getenv("EMBEDDING_CACHE_LRU_SIZE", "4096"))
+# Rows kept on disk (~6 KB each at 1536 dims) before the least recently used are deleted
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "100000"))
+# The row cap is checked once this many vectors have been written
+EMBEDDING_CACHE_PRUNE_EVERY = int(os.getenv("EMBEDDING_CACHE_PRUNE_EVERY", "1000"))
+
+# Keeps each SELECT ... IN (...) under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+# last_used_at in the same text format as CURRENT_TIMESTAMP, to the millisecond
+NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings provider with a content-addressed cache: an in-process
+    LRU in front of an SQLite table (embedding_cache in db/memory.db) keyed by
+    model, dimensions and the SHA-256 of the text. Only texts missing from
+    both are sent to the provider, deduplicated, in one batch. If the table
+    can't be read or written the cache just stops saving calls. The table is
+    capped at max_rows: disk hits refresh last_used_at, and every
+    EMBEDDING_CACHE_PRUNE_EVERY writes the least recently used rows over the
+    cap are deleted.
+    """
+
+    def __init__(self, provider, db_path: str = EMBEDDING_CACHE_DB_PATH, lru_size: int = EMBEDDING_CACHE_LRU_SIZE,
+                 max_rows: int = EMBEDDING_CACHE_MAX_ROWS):
+        self.provider = provider
+        self.model = getattr(provider, "model", type(provider).__name__)
+        self.dimensions = getattr(provider, "dimensions", None) or 0   # 0 = the model's default
+        self.db_path = db_path
+        self.lru_size = lru_size
+        self.max_rows = max_rows
+        self._lru = OrderedDict()   # text_hash -> np.float32 vector
+        self._lru_lock = threading.Lock()
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._writes_since_prune = EMBEDDING_CACHE_PRUNE_EVERY   # check the cap on the first write
+
+    def _hash(self, text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    # ==================== MEMORY TIER ====================
+
+    def _lru_get(self, keys: list) -> dict:
+        found = {}
+        with self._lru_lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+        return found
+
+    def _lru_put(self, vectors: dict):
+        with self._lru_lock:
+            for key, vector in vectors.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    # ==================== DISK TIER ====================
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        return self._conn
+
+    def _disk_get(self, keys: list) -> dict:
+        found = {}
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+                    chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    rows = conn.execute(f"""
+                        SELECT text_hash, vector FROM embedding_cache
+                        WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})
+                    """, (self.model, self.dimensions, *chunk)).fetchall()
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+                    if rows:
+                        hits = [key for key, _ in rows]
+                        conn.execute(f"""
+                            UPDATE embedding_cache SET last_used_at = {NOW_SQL}
+                            WHERE model = ? AND dimensions = ? AND text_hash IN ({", ".join("?" for _ in hits)})
+                        """, (self.model, self.dimensions, *hits))
+                conn.commit()
+        except sqlite3.Error as e:
+            metrics.increment("embedding_cache.disk_errors")
+            print(f"[EmbeddingCache] Disk lookup failed: {e}")
+        return found
+
+    def _disk_put(self, vectors: dict):
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                conn.executemany(f"""
+                    INSERT OR REPLACE INTO embedding_cache (model, dimensions, text_hash, vector, last_used_at)
+                    VALUES (?, ?, ?, ?, {NOW_SQL})
+                """, [
+                    (self.model, self.dimensions, key, vector.tobytes()) for key, vector in vectors.items()
+                ])
+                conn.commit()
+                self._writes_since_prune += len(vectors)
+                if self._writes_since_prune >= EMBEDDING_CACHE_PRUNE_EVERY:
+                    self._writes_since_prune = 0
+                    self._prune(conn)
+        except sqlite3.Error as e:
+            metrics.increment("embedding_cache.disk_errors")
+            print(f"[EmbeddingCache] Disk write failed: {e}")
+
+    def _prune(self, conn) -> int:
+        """Delete the least recently used rows over max_rows (any model). Call with _db_lock held."""
+        excess = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0] - self.max_rows
+        if excess <= 0:
+            return 0
+        conn.execute("""
+            DELETE FROM embedding_cache WHERE (model, dimensions, text_hash) IN (
+                SELECT model, dimensions, text_hash FROM embedding_cache ORDER BY last_used_at LIMIT ?
+            )
+        """, (excess,))
+        conn.commit()
+        metrics.increment("embedding_cache.pruned", excess)
+        print(f"[EmbeddingCache] Pruned {excess} least recently used vector(s)")
+        return excess
+
+    # ==================== LOOKUP ====================
+
+    def _lookup(self, keys: list) -> dict:
+        """Everything cached for these keys, memory first, then disk"""
+        found = self._lru_get(keys)
+        metrics.increment("embedding_cache.memory_hits", len(found))
+        missing = [key for key in keys if key not in found]
+        if missing:
+            on_disk = self._disk_get(missing)
+            metrics.increment("embedding_cache.disk_hits", len(on_disk))
+            self._lru_put(on_disk)
+            found.update(on_disk)
+        metrics.increment("embedding_cache.misses", len(keys) - len(found))
+        return found
+
+    def _plan(self, texts: list) -> tuple:
+        """(key per text, unique keys, key -> text) for a batch"""
+        keys = [self._hash(text) for text in texts]
+        texts_by_key = dict(zip(keys, texts))
+        return keys, list(texts_by_key), texts_by_key
+
+    def _remember(self, keys: list, embeddings: list) -> dict:
+        vectors = {key: np.asarray(embedding, dtype=np.float32) for key, embedding in zip(keys, embeddings)}
+        self._lru_put(vectors)
+        self._disk_put(vectors)
+        return vectors
+
+    # ==================== EMBEDDINGS API ====================
+
+    def embed_documents(self, texts: list) -> list:
+        keys, unique, texts_by_key = self._plan(texts)
+        found = self._lookup(unique)
+        missing = [key for key in unique if key not in found]
+        if missing:
+            found.update(self._remember(missing, self.provider.embed_documents([texts_by_key[key] for key in missing])))
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> list:
+        key = self._hash(text)
+        found = self._lookup([key])
+        if key not in found:
+            found.update(self._remember([key], [self.provider.embed_query(text)]))
+        return found[key].tolist()
+
+    async def aembed_documents(self, texts: list) -> list:
+        keys, unique, texts_by_key = self._plan(texts)
+        found = self._lru_get(unique)
+        if len(found) < len(unique):
+            found = await run_blocking(self._lookup, unique)
+        else:
+            metrics.increment("embedding_cache.memory_hits", len(found))
+        missing = [key for key in unique if key not in found]
+        if missing:
+            embeddings = await self.provider.aembed_documents([texts_by_key[key] for key in missing])
+            found.update(await run_blocking(self._remember, missing, embeddings))
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> list:
+        key = self._hash(text)
+        # Hot path: an LRU hit never leaves the event loop
+        found = self._lru_get([key])
+        if found:
+            metrics.increment("embedding_cache.memory_hits")
+        else:
+            found = await run_blocking(self._lookup, [key])
+        if key not in found:
+            embedding = await self.provider.aembed_query(text)
+            found.update(await run_blocking(self._remember, [key], [embedding]))
+        return found[key].tolist()
+
+
+# One provider for ingestion, retrieval, routing and memory
+embedding_model = CachedEmbeddings(OpenAIEmbeddings(
+    model=EMBEDDING_MODEL,
+    openai_api_key=os.getenv("OPENAI_API_KEY")
+))
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+GOOGLE_CACHE_TTL_SECONDS = int(os.getenv("GOOGLE_CACHE_TTL_SECONDS", "60"))
+# Cached (user, kind) entries kept before the least recently used is dropped
+GOOGLE_CACHE_MAX_ENTRIES = int(os.getenv("GOOGLE_CACHE_MAX_ENTRIES", "2000"))
+
+
+class GoogleDataCache:
+    """
+    Per-user TTL cache for raw Google Calendar / Tasks responses.
+    Concurrent misses for the same user and kind share one upstream fetch
+    (single-flight). Error responses are returned but never cached.
+    """
+
+    def __init__(self, ttl_seconds: int = GOOGLE_CACHE_TTL_SECONDS, max_entries: int = GOOGLE_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (user_id, kind) -> {"data", "fetched_at"}
+        self._in_flight = {}            # (user_id, kind) -> asyncio.Task
+
+    async def get(self, user_id: str, kind: str, fetch, refresh: bool = False) -> dict:
+        """
+        fetch is a zero-argument coroutine function hitting Google.
+        refresh=True skips the cached copy (but still joins a fetch already in flight).
+        """
+        key = (user_id, kind)
+
+        if not refresh:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry["fetched_at"] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                metrics.increment(f"google_cache.hit.{kind}")
+                return entry["data"]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            metrics.increment(f"google_cache.miss.{kind}")
+            task = asyncio.create_task(self._fetch(key, fetch))
+            self._in_flight[key] = task
+        else:
+            metrics.increment(f"google_cache.shared.{kind}")
+
+        # Shielded so one cancelled request doesn't cancel the fetch others are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: tuple, fetch) -> dict:
+        try:
+            data = await fetch()
+            if "error" not in data:
+                self._entries[key] = {"data": data, "fetched_at": time.monotonic()}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return data
+        finally:
+            self._in_flight.pop(key, None)
+
+    def invalidate_user(self, user_id: str):
+        for key in [key for key in self._entries if key[0] == user_id]:
+            del self._entries[key]
+
+
+google_cache = GoogleDataCache()
@@ -0,0 +1,59 @@
+import json
+import os
+
+import aiohttp
+
+
+GOOGLE_HTTP_TIMEOUT_SECONDS  = float(os.getenv("GOOGLE_HTTP_TIMEOUT_SECONDS", "10"))
+GOOGLE_HTTP_MAX_CONNECTIONS  = int(os.getenv("GOOGLE_HTTP_MAX_CONNECTIONS", "100"))
+# Task lists fetched at once for a single user during a sync
+TASK_LIST_CONCURRENCY        = int(os.getenv("GOOGLE_TASK_LIST_CONCURRENCY", "4"))
+
+CALENDAR_EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+TASK_LISTS_URL      = "https://tasks.googleapis.com/tasks/v1/users/@me/lists"
+TASKS_URL           = "https://tasks.googleapis.com/tasks/v1/lists/{list_id}/tasks"
+TOKEN_URL           = "https://oauth2.googleapis.com/token"
+
+
+class GoogleClient:
+    """
+    One long-lived aiohttp session for every Google API call, so connections
+    (and their TLS handshakes) are reused. Opened and closed by the app lifespan.
+    """
+
+    def __init__(self):
+        self._session = None
+
+    async def open(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=GOOGLE_HTTP_TIMEOUT_SECONDS),
+                connector=aiohttp.TCPConnector(limit=GOOGLE_HTTP_MAX_CONNECTIONS, keepalive_timeout=60),
+            )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def request(self, method: str, url: str, access_token: str = None, **kwargs) -> tuple:
+        """Returns (status, body_text)"""
+        if self._session is None or self._session.closed:
+            # Scripts and tests that skip the lifespan still get a session
+            await self.open()
+        headers = kwargs.pop("headers", {})
+        if access_token:
+            headers["Authorization"] = f"Bearer {access_token}"
+        async with self._session.request(method, url, headers=headers, **kwargs) as response:
+            return response.status, await response.text()
+
+    async def get_json(self, url: str, access_token: str = None, params: dict = None) -> dict:
+        """GET and decode JSON; Google's error bodies come back as {"error": ...} like any other"""
+        status, body = await self.request("GET", url, access_token=access_token, params=params)
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {"error": {"code": status, "message": body[:500]}}
+
+
+google_client = GoogleClient()
@@ -0,0 +1,206 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import metrics
+from activity_counters import activity_counters
+from blocking_io import run_blocking
+from google_client import (
+    google_client,
+    CALENDAR_EVENTS_URL,
+    TASK_LISTS_URL,
+    TASKS_URL,
+    TASK_LIST_CONCURRENCY,
+)
+from storage import google_sync_repository
+
+
+# Tasks has no sync tokens, so incremental pulls use updatedMin; this covers clock skew
+TASKS_UPDATED_MIN_SKEW = timedelta(minutes=2)
+
+# A full calendar sync covers now .. now + CALENDAR_SYNC_WINDOW_DAYS; recurring
+# events are expanded (singleEvents) only within that window
+CALENDAR_SYNC_WINDOW_DAYS = int(os.getenv("CALENDAR_SYNC_WINDOW_DAYS", "90"))
+# Another full sync runs once less than this much of the window is left, so
+# events moving into view are in the mirror before they are needed
+CALENDAR_RESYNC_HORIZON_DAYS = int(os.getenv("CALENDAR_RESYNC_HORIZON_DAYS", "30"))
+
+
+def _event_time(value: dict):
+    """Calendar start/end as a datetime — all-day events only have a date"""
+    if not value:
+        return None
+    if value.get("dateTime"):
+        return datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+    if value.get("date"):
+        return datetime.fromisoformat(value["date"]).replace(tzinfo=timezone.utc)
+    return None
+
+
+async def _get_all_pages(url: str, access_token: str, params: dict) -> dict:
+    """Follow nextPageToken. Returns {"items", "nextSyncToken"} or Google's error dict."""
+    params = dict(params)
+    items = []
+    while True:
+        data = await google_client.get_json(url, access_token, params)
+        if "error" in data:
+            return data
+        items.extend(data.get("items", []))
+        if not data.get("nextPageToken"):
+            return {"items": items, "nextSyncToken": data.get("nextSyncToken")}
+        params["pageToken"] = data["nextPageToken"]
+
+
+def _is_gone(data: dict) -> bool:
+    error = data.get("error")
+    return isinstance(error, dict) and error.get("code") == 410
+
+
+# ==================== CALENDAR ====================
+
+async def sync_calendar(user_id: str, access_token: str) -> dict:
+    """
+    Bring the user's calendar mirror up to date and return upcoming events from it.
+    Uses the stored syncToken when there is one; a 410 from Google means the
+    token expired and triggers a full resync. Full syncs are bounded to a
+    CALENDAR_SYNC_WINDOW_DAYS window and repeated before it runs out;
+    events that move past the window are dropped from the mirror until that resync.
+    """
+    now = datetime.now(timezone.utc)
+    state = await run_blocking(google_sync_repository.get_sync_state, user_id, "calendar")
+    sync_token = state["sync_token"] if state else None
+    window_end = state["window_end"] if state else None
+    full = sync_token is None
+    if not full and (window_end is None or window_end - now < timedelta(days=CALENDAR_RESYNC_HORIZON_DAYS)):
+        metrics.increment("google_sync.calendar.window_resync")
+        full = True
+
+    if not full:
+        data = await _get_all_pages(CALENDAR_EVENTS_URL, access_token, {
+            "syncToken": sync_token,
+            "singleEvents": "true",
+            "maxResults": 250,
+        })
+        if _is_gone(data):
+            print(f"[GoogleSync] Calendar sync token expired for user {user_id}, doing a full resync")
+            metrics.increment("google_sync.calendar.token_expired")
+            full = True
+
+    if full:
+        window_end = now + timedelta(days=CALENDAR_SYNC_WINDOW_DAYS)
+        data = await _get_all_pages(CALENDAR_EVENTS_URL, access_token, {
+            "timeMin": now.isoformat(),
+            "timeMax": window_end.isoformat(),
+            "singleEvents": "true",
+            "maxResults": 250,
+        })
+
+    if "error" in data:
+        print(f"Calendar API error: {data}")
+        return data
+
+    upserts, deleted = [], []
+    for event in data["items"]:
+        start = _event_time(event.get("start"))
+        if event.get("status") == "cancelled" or (start is not None and start > window_end):
+            # Cancelled, or moved past the mirrored window: drop any row it had
+            deleted.append(event["id"])
+        else:
+            upserts.append((event["id"], start, _event_time(event.get("end")), event))
+
+    next_sync_token = data.get("nextSyncToken")
+    if not next_sync_token:
+        # The stored token (if any) is kept; without one every request would be a full sync
+        metrics.increment("google_sync.calendar.missing_sync_token")
+        print(f"[GoogleSync] ALERT: Calendar returned no nextSyncToken for user {user_id}")
+
+    await run_blocking(
+        google_sync_repository.apply_calendar_changes,
+        user_id, upserts, deleted, next_sync_token, full, window_end if full else None
+    )
+    metrics.increment(f"google_sync.calendar.{'full' if full else 'incremental'}")
+    metrics.observe("google_sync.calendar.changes", len(data["items"]))
+    print(f"[GoogleSync] Calendar {'full' if full else 'incremental'} sync for user {user_id}: {len(data['items'])} change(s)")
+
+    items = await run_blocking(google_sync_repository.get_upcoming_events, user_id)
+    return {"items": items}
+
+
+# ==================== TASKS ====================
+
+def _completed_between(task: dict, since: datetime, until: datetime) -> bool:
+    """
+    Completed in [since, until). Each sync counts its own window, so a task
+    seen again by the next sync's updatedMin overlap isn't counted twice.
+    """
+    if task.get("deleted") or task.get("status") != "completed" or not task.get("completed"):
+        return False
+    completed_at = datetime.fromisoformat(task["completed"].replace("Z", "+00:00"))
+    return since <= completed_at < until
+
+
+async def sync_tasks(user_id: str, access_token: str) -> dict:
+    """
+    Bring the user's task mirror up to date and return pending tasks from it.
+    The stored marker is the start time of the last sync, used as updatedMin;
+    completed, hidden and deleted tasks in the delta are removed from the mirror.
+    Tasks completed between the last sync and this one count towards the
+    user's tasks counter.
+    """
+    last_sync = await run_blocking(google_sync_repository.get_sync_token, user_id, "tasks")
+    full = last_sync is None
+    started = datetime.now(timezone.utc)
+
+    lists_data = await google_client.get_json(TASK_LISTS_URL, access_token)
+    if "error" in lists_data:
+        print(f"Tasks API error: {lists_data}")
+        return lists_data
+    task_lists = lists_data.get("items", [])
+
+    if full:
+        params = {"showCompleted": "false", "showHidden": "false", "maxResults": 100}
+    else:
+        updated_min = datetime.fromisoformat(last_sync) - TASKS_UPDATED_MIN_SKEW
+        params = {
+            "updatedMin": updated_min.isoformat(),
+            "showCompleted": "true",
+            "showHidden": "true",
+            "showDeleted": "true",
+            "maxResults": 100,
+        }
+
+    semaphore = asyncio.Semaphore(TASK_LIST_CONCURRENCY)
+
+    async def fetch_list(task_list):
+        async with semaphore:
+            return await _get_all_pages(TASKS_URL.format(list_id=task_list["id"]), access_token, params)
+
+    results = await asyncio.gather(*[fetch_list(task_list) for task_list in task_lists])
+
+    upserts, deleted, completed = [], [], 0
+    for task_list, data in zip(task_lists, results):
+        if "error" in data:
+            print(f"Tasks API error: {data}")
+            return data
+        for task in data["items"]:
+            if not full and _completed_between(task, datetime.fromisoformat(last_sync), started):
+                completed += 1
+            if task.get("deleted") or task.get("hidden") or task.get("status") == "completed":
+                deleted.append(task["id"])
+            else:
+                upserts.append((task["id"], task_list["id"], task.get("position"), task))
+
+    await run_blocking(
+        google_sync_repository.apply_task_changes,
+        user_id, upserts, deleted,
+        [(task_list["id"], index, task_list.get("title", "My Tasks")) for index, task_list in enumerate(task_lists)],
+        started.isoformat(), full
+    )
+    activity_counters.increment(user_id, tasks=completed)
+    changes = len(upserts) + len(deleted)
+    metrics.increment(f"google_sync.tasks.{'full' if full else 'incremental'}")
+    metrics.observe("google_sync.tasks.changes", changes)
+    print(f"[GoogleSync] Tasks {'full' if full else 'incremental'} sync for user {user_id}: {changes} change(s)")
+
+    items = await run_blocking(google_sync_repository.get_tasks, user_id)
+    return {"items": items}
@@ -1,13 +1,14 @@
 import os
 import chromadb
 from langchain_community.document_loaders import TextLoader
-from langchain_community.embeddings import OpenAIEmbeddings
 from langchain_community.document_loaders import TextLoader, PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
 load_dotenv()
 
+from embedding_cache import embedding_model
+
 # Chroma Cloud client — shared connection config
 chroma_client = chromadb.CloudClient(
     api_key=os.getenv("CHROMA_API_KEY"),
@@ -92,10 +93,6 @@ def split_documents(documents, doc_type: str = "default", filename: str = "unkno
 
 def create_vector_store(chunks):
     print("Creating vector store and storing in Chroma Cloud...")
-    embedding_model = OpenAIEmbeddings(
-        model="text-embedding-3-small",
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
     vectorstore = Chroma.from_documents(
         documents=chunks,
         embedding=embedding_model,
@@ -14,9 +14,10 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
 from fastapi.responses import RedirectResponse
-import requests
+import aiohttp
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
 from dotenv import load_dotenv
 
@@ -26,22 +27,48 @@ import secrets
 
 
 from storage import user_repository
-from storage import token_repository
+from storage import google_sync_repository
+from storage import async_user_repository
+from storage import async_token_repository
+from storage.conversation_store import conversation_store
+from storage.job_queue import job_queue
+from storage.postgres_pool import pg_pool
+from storage import migrate
+from storage.async_postgres_pool import async_pg_pool
 
 from ingestion_pipeline import load_document, split_documents, create_vector_store
 from retrieval_pipeline import embedding_model, db
+from query_router import QueryRouter
+from answer_cache import answer_cache, context_fingerprint, history_key
+from google_cache import google_cache
+from google_client import google_client, TOKEN_URL
+from google_sync import sync_calendar, sync_tasks
+from token_refresher import token_refresher
+from activity_counters import activity_counters
+from prompt_budget import budget_prompt
+import metrics
+from blocking_io import blocking_executor, run_blocking
 import tempfile
-import sqlite3
+import uuid
 
 from storage.memory_manager import (
     get_conversational_context,
     retrieve_memory,
     store_memory,
-    demote_stale_memories
+    get_memory_content,
+    demote_stale_memories,
+    memory_store,
+    memory_hits,
+    memory_db,
+    memory_demotion,
+    memory_index
 )
 
 import traceback
 import sys
+import asyncio
+import json
+from contextlib import asynccontextmanager
 
 
 
@@ -52,7 +79,32 @@ backend_dir = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(backend_dir, '.env'))
 print("OPENAI_API_KEY loaded:", bool(os.getenv("OPENAI_API_KEY")))
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_blocking(pg_pool.open)
+    # One version query per database; schema changes are applied by `python -m storage.migrate`
+    await run_blocking(migrate.check)
+    await run_blocking(memory_store.open)
+    await async_pg_pool.open()
+    await google_client.open()
+    job_queue.start(blocking_executor)
+    token_refresher.start()
+    activity_counters.start()
+    memory_hits.start()
+    memory_demotion.start()
+    yield
+    await memory_demotion.stop()
+    await memory_hits.stop()
+    await activity_counters.stop()
+    await token_refresher.stop()
+    await job_queue.stop()
+    await google_client.close()
+    await async_pg_pool.close()
+    pg_pool.close()
+    memory_db.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -63,13 +115,11 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization", "X-User-ID"],
     )
 
-user_repository.create_table()
-token_repository.create_table()
 
-# ==================== GLOBAL STATE ====================
-current_results = {
-    "chat_history": [],  # Will store conversation history
-}
+# ==================== CHAT SETTINGS ====================
+# Start document retrieval alongside routing instead of after it.
+# Turn off when embedding cost matters more than latency.
+SPECULATIVE_RAG = os.getenv("SPECULATIVE_RAG", "true").lower() == "true"
 
 
 #Create a user class to be able to store initial keys for the database
@@ -82,40 +132,49 @@ class UserCreate(BaseModel):
     system_prompt: Optional[str] = None
     
     
-def format_google_data(events_data: dict, tasks_data: dict) -> str:
+def google_context_items(events_data: dict, tasks_data: dict) -> dict:
+    """Prompt lines for calendar events and tasks, most relevant first"""
+    event_lines = []
+    for event in events_data.get("items", [])[:20]:  # cap at 20
+        title = event.get("summary", "Untitled")
+        start = event.get("start", {})
+        start_time = start.get("dateTime") or start.get("date", "Unknown time")
+        location = event.get("location", "")
+        loc_str = f" @ {location}" if location else ""
+        event_lines.append(f"- {title}{loc_str} | {start_time}")
+
+    task_lines = []
+    for task in tasks_data.get("items", [])[:20]:  # cap at 20
+        title = task.get("title", "Untitled")
+        due = task.get("due", "")
+        due_str = f" (due {due})" if due else ""
+        list_title = task.get("listTitle", "")
+        task_lines.append(f"- [{list_title}] {title}{due_str}")
+
+    return {"events": event_lines, "tasks": task_lines}
+
+
+def format_google_data(google_items: dict) -> str:
     lines = []
 
     # Format calendar events
-    events = events_data.get("items", [])
-    if events:
+    if google_items["events"]:
         lines.append("=== Upcoming Calendar Events ===")
-        for event in events[:20]:  # cap at 20
-            title = event.get("summary", "Untitled")
-            start = event.get("start", {})
-            start_time = start.get("dateTime") or start.get("date", "Unknown time")
-            location = event.get("location", "")
-            loc_str = f" @ {location}" if location else ""
-            lines.append(f"- {title}{loc_str} | {start_time}")
+        lines.extend(google_items["events"])
     else:
         lines.append("=== No upcoming calendar events ===")
 
     # Format tasks
-    tasks = tasks_data.get("items", [])
-    if tasks:
+    if google_items["tasks"]:
         lines.append("\n=== Pending Tasks ===")
-        for task in tasks[:20]:  # cap at 20
-            title = task.get("title", "Untitled")
-            due = task.get("due", "")
-            due_str = f" (due {due})" if due else ""
-            list_title = task.get("listTitle", "")
-            lines.append(f"- [{list_title}] {title}{due_str}")
+        lines.extend(google_items["tasks"])
     else:
         lines.append("\n=== No pending tasks ===")
 
     return "\n".join(lines)
 
 def classify_query(query: str) -> str:
-    """Returns 'RAG', 'WEB', or 'LLM'"""
+    """LLM router, used only when the local router isn't confident. Returns 'RAG', 'WEB', or 'LLM'"""
     classification_response = model.invoke([
         SystemMessage(content=
     """You are a query router. Classify the user's query into exactly one category:
@@ -131,7 +190,7 @@ def classify_query(query: str) -> str:
     result = classification_response.content.strip().upper()
     if result not in ("RAG", "WEB", "LLM"):
         result = "LLM"  # safe fallback
-    print(f"[Router] Query classified as: {result}")
+    print(f"[Router] LLM fallback classified query as: {result}")
     return result
 
 
@@ -246,73 +305,17 @@ def google_verify():
     return FileResponse(os.path.join(os.path.dirname(__file__), "static", "googleb6a142b0a0531b3b.html"))
 
 
-def get_upcoming_events(access_token):
-    """Fetch upcoming Google Calendar events"""
-    from datetime import datetime, timezone
-    
-    url = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-    
-    # Get current time in ISO format
-    now = datetime.now(timezone.utc).isoformat()
-    
-    params = {
-        "maxResults": 50,  # Increased to get more events
-        "orderBy": "startTime",
-        "singleEvents": True,
-        "timeMin": now,  # Start from current time
-    }
-    
-    print(f"Fetching calendar events with timeMin: {now}")
-    r = requests.get(url, headers=headers, params=params)
-    response_data = r.json()
-    
-    if "error" in response_data:
-        print(f"Calendar API error: {response_data}")
-    else:
-        print(f"Found {len(response_data.get('items', []))} calendar events")
-    
-    return response_data
+# Each cache miss runs an incremental sync into the Postgres mirror and reads from it
+async def fetch_events_cached(user_id: str, access_token: str, refresh: bool = False) -> dict:
+    return await google_cache.get(
+        user_id, "events", lambda: sync_calendar(user_id, access_token), refresh=refresh
+    )
 
 
-def get_tasks(access_token):
-    """Fetch Google Tasks"""
-    # First, get the task lists
-    lists_url = "https://tasks.googleapis.com/tasks/v1/users/@me/lists"
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-    
-    lists_response = requests.get(lists_url, headers=headers)
-    lists_data = lists_response.json()
-    
-    if "error" in lists_data:
-        print(f"Tasks API error: {lists_data}")
-        return lists_data
-    
-    # Get tasks from all lists
-    all_tasks = []
-    for task_list in lists_data.get("items", []):
-        list_id = task_list["id"]
-        tasks_url = f"https://tasks.googleapis.com/tasks/v1/lists/{list_id}/tasks"
-        
-        params = {
-            "showCompleted": False,  # Only show incomplete tasks
-            "showHidden": False
-        }
-        
-        tasks_response = requests.get(tasks_url, headers=headers, params=params)
-        tasks_data = tasks_response.json()
-        
-        if "items" in tasks_data:
-            for task in tasks_data["items"]:
-                task["listTitle"] = task_list.get("title", "My Tasks")
-                all_tasks.append(task)
-    
-    print(f"Found {len(all_tasks)} tasks")
-    return {"items": all_tasks}
+async def fetch_tasks_cached(user_id: str, access_token: str, refresh: bool = False) -> dict:
+    return await google_cache.get(
+        user_id, "tasks", lambda: sync_tasks(user_id, access_token), refresh=refresh
+    )
 
 
 # Initialize ChatOpenAI model
@@ -322,135 +325,431 @@ model = ChatOpenAI(
     openai_api_key=os.getenv("OPENAI_API_KEY"),
 )
 
+query_router = QueryRouter(embedding_model, classify_query)
+
 def embed_on_upload(file_path: str, doc_type: str = "default", user_id: str = None):
     documents = load_document(file_path)
     chunks = split_documents(documents, doc_type=doc_type, filename=os.path.basename(file_path), user_id=user_id)
     create_vector_store(chunks)
     print(f"[Ingest] {file_path} ingested successfully for user_id={user_id}")
 
-def get_db_conn():
-    conn = sqlite3.connect("db/memory.db")
-    return conn
+
+# ==================== CHAT CONTEXT STAGES ====================
+# Each stage is independent of the others, so chat() fans them out together
+# and a request takes roughly as long as its slowest stage.
+
+async def load_user_profile(user_id: str):
+    db_user = (await async_user_repository.get_identity(user_id))["user"]
+    if not db_user:
+        return None
+    return {
+        "name": db_user.get("display_name"),
+        "title": db_user.get("title"),
+        "location": db_user.get("location"),
+        "system_prompt": db_user.get("system_prompt")
+    }
+
+
+async def load_google_context(user_id: str):
+    """Fetch calendar events and tasks concurrently. Returns google_context_items() or None."""
+    user_token_data = await token_refresher.get_valid_tokens(user_id)
+    if not user_token_data:
+        return None
+
+    access_token = user_token_data["tokens"].get("access_token")
+    if not access_token:
+        return None
+
+    try:
+        events_data, tasks_data = await asyncio.gather(
+            fetch_events_cached(user_id, access_token),
+            fetch_tasks_cached(user_id, access_token),
+        )
+        return google_context_items(events_data, tasks_data)
+    except Exception as e:
+        print(f"Failed to fetch Google data for chat: {e}")
+        return None
+
+
+async def load_memory_context(user_message: str, user_id: str, embedding_task: asyncio.Task) -> dict:
+    try:
+        # Shielded like retrieve_documents: the embedding is shared with the cache and RAG
+        query_embedding = await asyncio.shield(embedding_task)
+        memory_result = await retrieve_memory(user_message, user_id, query_embedding)
+    except Exception as e:
+        print(f"[Memory] Retrieval failed: {e}")
+        return {"context": "", "entries": [], "tier": "none"}
+
+    if memory_result["entries"]:
+        print(f"[Memory] Hit from {memory_result['tier']}")
+    return memory_result
+
+
+async def _noop(value=None):
+    return value
+
+
+# ==================== BACKGROUND JOBS ====================
+
+def summarize_conversation_job(user_id: str, payload: dict):
+    """
+    Condense the last 20 messages into a short-term memory note.
+    The memory id is derived from the messages, so a retried job
+    stores the same memory instead of a second one.
+    """
+    history_text = "\n".join([
+        f"{'User' if m['role'] == 'human' else 'Prodigy'}: {m['content']}"
+        for m in payload["history"][-20:]
+    ])
+    embedding_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"prodigy:summary:{user_id}:{history_text}"))
+    summary = get_memory_content(embedding_id)
+    if summary is None:
+        summary = model.invoke([
+            SystemMessage(content="""Summarize this conversation into 3-5 sentences.
+            Focus on: topics discussed, decisions made, key facts about the user.
+            Write it as a memory note, not a transcript."""),
+            HumanMessage(content=history_text)
+        ]).content
+    store_memory(summary, user_id, embedding_id)
+    answer_cache.invalidate_user(user_id)
+    print(f"[Memory] Summarized and stored conversation for user {user_id}")
+
+
+def demote_memories_job(user_id: str, payload: dict):
+    # Demotion now runs on memory_demotion's schedule; this only drains
+    # demote_memories jobs queued before the switch
+    demote_stale_memories()
+
+
+job_queue.register("summarize_conversation", summarize_conversation_job)
+job_queue.register("demote_memories", demote_memories_job)
+
+
+def get_request_user_id(request: Request):
+    return request.headers.get("X-User-ID") or request.cookies.get("user_id")
+
+
+async def retrieve_documents(user_id: Optional[str], embedding_task: asyncio.Task) -> list:
+    # Shielded so cancelling a speculative search never cancels the shared embedding
+    query_embedding = await asyncio.shield(embedding_task)
+    return await run_blocking(
+        db.similarity_search_by_vector,
+        query_embedding,
+        k=4,
+        filter={"user_id": user_id}   # NEW — scopes retrieval to this user only
+    )
+
+
+async def route_query(user_message: str, user_id: Optional[str], embedding_task: Optional[asyncio.Task],
+                      route_ready: asyncio.Future = None) -> str:
+    """Route with the request's query embedding when there is one, so the router doesn't embed again"""
+    query_embedding = None
+    if embedding_task:
+        try:
+            query_embedding = await asyncio.shield(embedding_task)
+        except Exception:
+            pass   # the router embeds on its own if it needs to
+    route = await run_blocking(query_router.route, user_message, user_id, query_embedding)
+    if route_ready is not None and not route_ready.done():
+        route_ready.set_result(route)
+    return route
+
+
+def _discard_task(task: asyncio.Task):
+    """Cancel a speculative task we no longer need without leaking its exception"""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+def assemble_messages(user_message: str, route: str, user_profile, google_items,
+                      memory_result: dict, chat_history: list, rag_results) -> tuple:
+    """
+    Build the prompt within the token budget (prompt_budget.SECTION_BUDGETS).
+    Soonest events/tasks, newest history and best-ranked memories and chunks are
+    kept first. Returns (messages, token_counts).
+    """
+    event_lines = google_items["events"] if google_items else []
+    task_lines = google_items["tasks"] if google_items else []
+    memory_entries = memory_result.get("entries", []) if memory_result else []
+    rag_chunks = [
+        f"[{doc.metadata.get('source', 'unknown')}]\n{doc.page_content}"
+        for doc in rag_results or []
+    ]
+
+    kept, token_counts = budget_prompt(
+        fixed={
+            "system": create_system_message(user_profile).content,
+            "query": user_message,
+        },
+        sections={
+            # events and tasks interleave so neither list starves the other
+            "google": [(i, line) for i, line in enumerate(event_lines)]
+                      + [(i, line) for i, line in enumerate(task_lines)],
+            "history": [(len(chat_history) - i, m.content) for i, m in enumerate(chat_history)],
+            "memory": list(enumerate(memory_entries)),
+            "rag": list(enumerate(rag_chunks)),
+        },
+    )
+
+    # Only users with Google connected get the section at all
+    calendar_context = ""
+    if google_items is not None:
+        calendar_context = format_google_data({
+            "events": [line for i, line in kept["google"] if i < len(event_lines)],
+            "tasks": [line for i, line in kept["google"] if i >= len(event_lines)],
+        })
+
+    # Memory context is always the base — RAG/WEB appends on top
+    context_block = ""
+    if kept["memory"]:
+        tier_label = "Recent Memory" if memory_result["tier"] == "short_term" else "Past Memory"
+        context_block = f"\n\n=== {tier_label} ===\n" + "\n---\n".join(text for _, text in kept["memory"])
+
+    if route == "RAG":
+        if rag_results is None:
+            context_block += "\n\n[Document retrieval failed. Answering from general knowledge.]"
+        elif kept["rag"]:
+            context_block += "\n\n=== Retrieved Context From Your Documents ===\n"
+            context_block += "\n---\n".join(text for _, text in kept["rag"])
+        else:
+            context_block += "\n\n[RAG attempted but no relevant documents found. Answering from general knowledge.]"
+    elif route == "WEB":
+        context_block += "\n\n[Web search not yet implemented. Answering from general knowledge — this answer may be outdated.]"
+
+    augmented_message = f"{user_message}\n{context_block}" if context_block else user_message
+
+    kept_history = [chat_history[i] for i, _ in kept["history"]]
+    messages = (
+        [create_system_message(user_profile, calendar_context)]
+        + kept_history
+        + [HumanMessage(content=augmented_message)]
+    )
+    return messages, token_counts
+
+
+async def prepare_chat_turn(user_message: str, user_id: Optional[str], route_ready: asyncio.Future = None) -> dict:
+    """
+    Gather every context layer and assemble the prompt.
+    Returns {"messages", "route", "cached_reply", "query_embedding", "fingerprint", "history_key", "prompt_tokens"};
+    when cached_reply is set the prompt is not built and the model should be skipped.
+    route_ready, if given, gets the route as soon as the router decides,
+    before the rest of the context has been gathered.
+    """
+    # One query embedding serves the answer cache, routing, both memory tiers and document retrieval
+    embedding_task = asyncio.create_task(embedding_model.aembed_query(user_message)) if user_id else None
+
+    # Speculative RAG — embed and search while the router is still deciding
+    rag_task = None
+    if SPECULATIVE_RAG and user_id:
+        rag_task = asyncio.create_task(retrieve_documents(user_id, embedding_task))
+
+    # ==================== CONTEXT FAN-OUT ====================
+    # Memory (layers 2 + 3) and routing start now but are only awaited after
+    # the answer cache, which needs just the embedding, profile, Google data and history
+    memory_task = asyncio.create_task(load_memory_context(user_message, user_id, embedding_task)) if user_id else None
+    route_task = asyncio.create_task(route_query(user_message, user_id, embedding_task, route_ready))
+    pending = [task for task in (rag_task, memory_task, route_task, embedding_task) if task]
+    try:
+        user_profile, google_items, chat_history, cache_version = await asyncio.gather(
+            load_user_profile(user_id) if user_id else _noop(None),
+            load_google_context(user_id) if user_id else _noop(None),
+            run_blocking(conversation_store.get_history, user_id, 10),  # layer 1 — last 10 only
+            run_blocking(answer_cache.version, user_id) if user_id else _noop(None),
+        )
+    except Exception:
+        for task in pending:
+            _discard_task(task)
+        raise
+
+    turn = {
+        "messages": None,
+        "route": None,
+        "cached_reply": None,
+        "query_embedding": None,
+        # No readable version means no safe way to tell a stale reply apart: skip the cache
+        "fingerprint": context_fingerprint(user_profile, google_items, cache_version) if cache_version is not None else None,
+        "history_key": history_key(chat_history),
+        "prompt_tokens": None,
+    }
+
+    # ==================== ANSWER CACHE ====================
+    if embedding_task:
+        try:
+            turn["query_embedding"] = await asyncio.shield(embedding_task)
+            cached = None
+            if turn["fingerprint"]:
+                cached = answer_cache.lookup(user_id, turn["query_embedding"], turn["fingerprint"], turn["history_key"])
+        except Exception as e:
+            print(f"[AnswerCache] Lookup skipped: {e}")
+            cached = None
+        if cached:
+            for task in (rag_task, memory_task, route_task):
+                if task:
+                    _discard_task(task)
+            print(f"[AnswerCache] Hit for user {user_id}")
+            turn["route"] = cached["route"]
+            turn["cached_reply"] = cached["reply"]
+            return turn
+
+    try:
+        memory_result, route = await asyncio.gather(memory_task or _noop(None), route_task)
+    except Exception:
+        for task in pending:
+            _discard_task(task)
+        raise
+    turn["route"] = route
+
+    if rag_task and route != "RAG":
+        _discard_task(rag_task)
+        metrics.increment("rag.speculative_wasted")
+
+    # ==================== ROUTING ====================
+    rag_results = []
+    if route == "RAG":
+        try:
+            if rag_task:
+                metrics.increment("rag.speculative_used")
+                rag_results = await rag_task
+            else:
+                if embedding_task is None:
+                    embedding_task = asyncio.create_task(embedding_model.aembed_query(user_message))
+                rag_results = await retrieve_documents(user_id, embedding_task)
+        except Exception as e:
+            print(f"[RAG] Retrieval failed: {e}")
+            rag_results = None
+
+    turn["messages"], turn["prompt_tokens"] = assemble_messages(
+        user_message, route, user_profile, google_items, memory_result, chat_history, rag_results
+    )
+    return turn
+
+
+async def record_turn(user_message: str, response_text: str, user_id: Optional[str], turn: dict):
+    """Append the finished turn to history, cache fresh replies and summarize every 20 turns"""
+    message_count = await run_blocking(conversation_store.append_turn, user_id, user_message, response_text)
+    activity_counters.increment(user_id, chats=1)
+
+    if user_id and turn["fingerprint"] and turn["query_embedding"] is not None and not turn["cached_reply"]:
+        answer_cache.store(
+            user_id, turn["query_embedding"], turn["fingerprint"], turn["history_key"], response_text, turn["route"]
+        )
+
+    # ==================== SUMMARIZE EVERY 20 TURNS ====================
+    # Queued so the summarization call never lands on the user's reply
+    if user_id and message_count % 20 == 0:
+        try:
+            history = await run_blocking(conversation_store.get_history, user_id, 20)
+            payload = {"history": [{"role": m.type, "content": m.content} for m in history]}
+            await run_blocking(job_queue.enqueue, "summarize_conversation", user_id, payload)
+        except Exception as e:
+            print(f"[Memory] Could not queue summarization: {e}")
+
 
 @app.post("/chat")
 async def chat(request: Request):
     try:
         data = await request.json()
         user_message = data.get("message", "").strip()
-        
-        user_id = request.headers.get("X-User-ID")
-        if not user_id:
-            user_id = request.cookies.get("user_id")
-
-        user_profile = None
-        calendar_context = ""
-        conn = get_db_conn()
-
-        if user_id:
-            db_user = user_repository.get_user_by_google_id(user_id)
-            if db_user:
-                user_profile = {
-                    "name": db_user.get("display_name"),
-                    "title": db_user.get("title"),
-                    "location": db_user.get("location"),
-                    "system_prompt": db_user.get("system_prompt")
-                }
+        user_id = get_request_user_id(request)
 
-            user_token_data = token_repository.get_tokens(user_id)
-            if user_token_data:
-                access_token = user_token_data["tokens"].get("access_token")
-                if access_token:
-                    try:
-                        events_data = get_upcoming_events(access_token)
-                        tasks_data = get_tasks(access_token)
-                        calendar_context = format_google_data(events_data, tasks_data)
-                    except Exception as e:
-                        print(f"Failed to fetch Google data for chat: {e}")
-
-        # ==================== MEMORY HIERARCHY ====================
-        memory_context = ""
-        if user_id:
-            memory_result = retrieve_memory(user_message, user_id, conn)
-            if memory_result["context"]:
-                tier_label = "Recent Memory" if memory_result["tier"] == "short_term" else "Past Memory"
-                memory_context = f"\n\n=== {tier_label} ===\n{memory_result['context']}"
-                print(f"[Memory] Hit from {memory_result['tier']}")
-
-        # ==================== ROUTING ====================
-        route = classify_query(user_message)
-        
-        # Memory context is always the base — RAG/WEB appends on top
-        context_block = memory_context
-
-        if route == "RAG":
-            try:
-                query_embedding = embedding_model.embed_query(user_message)
-                rag_results = db.similarity_search_by_vector(
-                    query_embedding,
-                    k=4,
-                    filter={"user_id": user_id}   # NEW — scopes retrieval to this user only
-                )
-                if rag_results:
-                    context_block += "\n\n=== Retrieved Context From Your Documents ===\n"
-                    context_block += "\n---\n".join([
-                        f"[{doc.metadata.get('source', 'unknown')}]\n{doc.page_content}"
-                        for doc in rag_results
-                    ])
-                else:
-                    context_block += "\n\n[RAG attempted but no relevant documents found. Answering from general knowledge.]"
-            except Exception as e:
-                print(f"[RAG] Retrieval failed: {e}")
-                context_block += "\n\n[Document retrieval failed. Answering from general knowledge.]"
-        elif route == "WEB":
-            context_block += "\n\n[Web search not yet implemented. Answering from general knowledge — this answer may be outdated.]"
+        turn = await prepare_chat_turn(user_message, user_id)
 
         # ==================== INVOKE ====================
-        augmented_message = f"{user_message}\n{context_block}" if context_block else user_message
+        if turn["cached_reply"]:
+            response_text = turn["cached_reply"]
+        else:
+            response = await model.ainvoke(turn["messages"])
+            response_text = response.content
 
-        messages = (
-            [create_system_message(user_profile, calendar_context)]
-            + current_results["chat_history"][-10:]  # layer 1 — last 10 only
-            + [HumanMessage(content=augmented_message)]
-        )
+        await record_turn(user_message, response_text, user_id, turn)
 
-        response = model.invoke(messages)
-        response_text = response.content
-
-        current_results["chat_history"].append(HumanMessage(content=user_message))
-        current_results["chat_history"].append(AIMessage(content=response_text))
-
-        # ==================== SUMMARIZE EVERY 20 TURNS ====================
-        if user_id and len(current_results["chat_history"]) % 20 == 0:
-            try:
-                history_text = "\n".join([
-                    f"{'User' if isinstance(m, HumanMessage) else 'Prodigy'}: {m.content}"
-                    for m in current_results["chat_history"][-20:]
-                ])
-                summary_response = model.invoke([
-                    SystemMessage(content="""Summarize this conversation into 3-5 sentences.
-                    Focus on: topics discussed, decisions made, key facts about the user.
-                    Write it as a memory note, not a transcript."""),
-                    HumanMessage(content=history_text)
-                ])
-                import uuid
-                embedding_id = str(uuid.uuid4())
-                store_memory(summary_response.content, user_id, conn, embedding_id)
-                demote_stale_memories(conn)
-                print(f"[Memory] Summarized and stored conversation for user {user_id}")
-            except Exception as e:
-                print(f"[Memory] Summarization failed: {e}")
-
-        return {"reply": response_text, "route": route, "error": None}
+        return {
+            "reply": response_text,
+            "route": turn["route"],
+            "cached": bool(turn["cached_reply"]),
+            "error": None
+        }
 
     except Exception as e:
         print(f"Chat error: {str(e)}")
         import traceback
         traceback.print_exc()
         return {"reply": "An error occurred while processing your message. Please try again.", "error": str(e)}
-    
-    finally:
-        # Always close the connection whether or not an exception occurred
-        conn.close()
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    """
+    Server-sent-event variant of /chat.
+    Emits `route` as soon as the router decides (while the rest of the context
+    is still loading), then one `token` event per chunk, then `done`.
+    A cached reply arrives as a single token, and `done` carries the final
+    route and cached flag. History and summarization are handled after the
+    stream closes.
+    """
+    data = await request.json()
+    user_message = data.get("message", "").strip()
+    user_id = get_request_user_id(request)
+
+    # Filled in by the generator, read by the background task once the stream closes
+    state = {"turn": None, "reply": None}
+
+    async def event_stream():
+        route_ready = asyncio.get_running_loop().create_future()
+        prepare_task = asyncio.create_task(prepare_chat_turn(user_message, user_id, route_ready))
+        try:
+            await asyncio.wait({prepare_task, route_ready}, return_when=asyncio.FIRST_COMPLETED)
+            route_sent = route_ready.done()
+            if route_sent:
+                yield sse_event("route", {"route": route_ready.result(), "cached": False})
+
+            turn = await prepare_task
+            state["turn"] = turn
+            cached = bool(turn["cached_reply"])
+            if not route_sent:
+                yield sse_event("route", {"route": turn["route"], "cached": cached})
+
+            if cached:
+                reply = turn["cached_reply"]
+                yield sse_event("token", {"content": reply})
+            else:
+                parts = []
+                async for chunk in model.astream(turn["messages"]):
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield sse_event("token", {"content": chunk.content})
+                reply = "".join(parts)
+
+            state["reply"] = reply
+            yield sse_event("done", {"route": turn["route"], "cached": cached, "error": None})
+
+        except Exception as e:
+            print(f"Chat stream error: {str(e)}")
+            traceback.print_exc()
+            yield sse_event("error", {
+                "reply": "An error occurred while processing your message. Please try again.",
+                "error": str(e)
+            })
+        finally:
+            # Client went away mid-preparation
+            if not prepare_task.done():
+                _discard_task(prepare_task)
+
+    async def finish_turn():
+        # Only complete replies make it into history
+        if state["reply"] is not None:
+            await record_turn(user_message, state["reply"], user_id, state["turn"])
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(finish_turn),
+    )
 
 
 @app.post("/export/conversation")
@@ -461,7 +760,9 @@ async def export_conversation(request: Request):
     """
     try:
         data = await request.json()
-        
+        user_id = get_request_user_id(request)
+        chat_history = await run_blocking(conversation_store.get_history, user_id)
+
         export_data = {
             "report_metadata": {
                 "tool": "Prodigy",
@@ -473,7 +774,7 @@ async def export_conversation(request: Request):
                     "role": msg.type if hasattr(msg, 'type') else "unknown",
                     "content": msg.content if hasattr(msg, 'content') else str(msg)
                 }
-                for msg in current_results["chat_history"]
+                for msg in chat_history
             ]
         }
         
@@ -485,6 +786,21 @@ async def export_conversation(request: Request):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        **metrics.snapshot(),
+        "pg_pool": pg_pool.stats(),
+        "pg_async_pool": async_pg_pool.stats(),
+        "memory_index": memory_index.stats(),
+    }
+
+
+@app.get("/jobs/status")
+async def jobs_status():
+    return await run_blocking(job_queue.stats)
+
+
 # ==================== OAUTH CONFIGURATION ====================
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 REDIRECT_URI = os.getenv("REDIRECT_URI")
@@ -537,7 +853,6 @@ async def google_callback(request: Request):
             return JSONResponse({"error": "No code provided"}, status_code=400)
 
         # Exchange code for tokens
-        token_url = "https://oauth2.googleapis.com/token"
         data = {
             "code": code,
             "client_id": CLIENT_ID,
@@ -547,16 +862,16 @@ async def google_callback(request: Request):
         }
         
         print("Exchanging code for tokens...")
-        token_response = requests.post(token_url, data=data)
+        token_status, token_body = await google_client.request("POST", TOKEN_URL, data=data)
         
-        if token_response.status_code != 200:
-            print(f"Token exchange failed: {token_response.text}")
+        if token_status != 200:
+            print(f"Token exchange failed: {token_body}")
             return JSONResponse(
-                {"error": "Token exchange failed", "details": token_response.text},
-                status_code=token_response.status_code
+                {"error": "Token exchange failed", "details": token_body},
+                status_code=token_status
             )
         
-        token_data = token_response.json()
+        token_data = json.loads(token_body)
         print(f"Token data received: {list(token_data.keys())}")
 
         # Check if we got an access token
@@ -568,20 +883,21 @@ async def google_callback(request: Request):
 
         # Fetch user info using the correct endpoint
         print("Fetching user info...")
-        userinfo_resp = requests.get(
+        userinfo_status, userinfo_body = await google_client.request(
+            "GET",
             "https://www.googleapis.com/oauth2/v3/userinfo",  # Use v3 endpoint
-            headers={"Authorization": f"Bearer {token_data['access_token']}"}
+            access_token=token_data['access_token']
         )
         
-        if userinfo_resp.status_code != 200:
-            print(f"Userinfo request failed: {userinfo_resp.text}")
+        if userinfo_status != 200:
+            print(f"Userinfo request failed: {userinfo_body}")
             # If userinfo fails, generate a fallback user ID from the token
             import hashlib
             user_id = hashlib.sha256(token_data['access_token'].encode()).hexdigest()[:16]
             user_info = {"sub": user_id, "email": "unknown@example.com"}
             print(f"Using fallback user_id: {user_id}")
         else:
-            user_info = userinfo_resp.json()
+            user_info = json.loads(userinfo_body)
             print(f"User info received: {user_info}")
 
         # Google OAuth2 userinfo uses "sub" for user ID
@@ -594,7 +910,7 @@ async def google_callback(request: Request):
             )
 
         # Store token data
-        token_repository.save_tokens(user_id, token_data, user_info)
+        await async_token_repository.save_tokens(user_id, token_data, user_info)
 
         
         print(f"User {user_id} authenticated successfully")
@@ -619,7 +935,7 @@ async def google_callback(request: Request):
         print(f"Setting cookie for user_id: {user_id}")
         return response
     
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"Request error during OAuth: {str(e)}")
         import traceback
         traceback.print_exc()
@@ -634,9 +950,10 @@ async def google_callback(request: Request):
 @app.get("/events")
 async def events(
     user_id: Optional[str] = Cookie(None),
-    request: Request = None
+    request: Request = None,
+    refresh: bool = False
 ):
-    """Get user's Google Calendar events"""
+    """Get user's Google Calendar events (pass ?refresh=true to bypass the cache)"""
     try:
         # Try to get user_id from cookie first, then from header
         if not user_id:
@@ -651,7 +968,7 @@ async def events(
                 status_code=401
             )
                 
-        user_data = token_repository.get_tokens(user_id)
+        user_data = await token_refresher.get_valid_tokens(user_id)
         if not user_data:
             return JSONResponse(
                 {"error": "session_expired", "message": "Session expired. Please log in again."},
@@ -668,7 +985,7 @@ async def events(
         
         print(f"Fetching events for user {user_id}")
         # Fetch events
-        events_data = get_upcoming_events(access_token)
+        events_data = await fetch_events_cached(user_id, access_token, refresh=refresh)
         
         # Check if the API call failed (e.g., token expired)
         if "error" in events_data:
@@ -693,9 +1010,10 @@ async def events(
 @app.get("/tasks")
 async def tasks(
     user_id: Optional[str] = Cookie(None),
-    request: Request = None
+    request: Request = None,
+    refresh: bool = False
 ):
-    """Get user's Google Tasks"""
+    """Get user's Google Tasks (pass ?refresh=true to bypass the cache)"""
     try:
         # Try to get user_id from cookie first, then from header
         if not user_id:
@@ -707,7 +1025,7 @@ async def tasks(
                 status_code=401
             )
         
-        user_data = token_repository.get_tokens(user_id)
+        user_data = await token_refresher.get_valid_tokens(user_id)
         if not user_data:
             return JSONResponse(
                 {"error": "session_expired", "message": "Session expired. Please log in again."},
@@ -724,7 +1042,7 @@ async def tasks(
         
         print(f"Fetching tasks for user {user_id}")
         # Fetch tasks
-        tasks_data = get_tasks(access_token)
+        tasks_data = await fetch_tasks_cached(user_id, access_token, refresh=refresh)
         
         # Check if the API call failed
         if "error" in tasks_data:
@@ -754,17 +1072,20 @@ async def auth_status(
     if not user_id:
         user_id = request.headers.get("X-User-ID")
     
-    user_data = token_repository.get_tokens(user_id)
-    if not user_id or not user_data:
+    if not user_id:
+        return {"authenticated": False}
+
+    identity = await async_user_repository.get_identity(user_id)
+    if not identity["tokens"]:
         return {"authenticated": False}
 
-    profile = user_data["profile"]
+    profile = identity["profile"]
 
     # Check if user exists in DB
-    existing_user = user_repository.get_user_by_google_id(user_id)
+    existing_user = identity["user"]
 
     if not existing_user:
-        user_repository.create_user(
+        await async_user_repository.create_user(
             UserCreate(
                 email=profile.get("email", ""),
                 display_name=profile.get("name", ""),
@@ -776,9 +1097,9 @@ async def auth_status(
                 tasks=0,
                 pdfs=0
             ),
-            google_id=user_id
+            user_id
         )
-    existing_user = user_repository.get_user_by_google_id(user_id)
+        existing_user = (await async_user_repository.get_identity(user_id))["user"]
     return {
         "authenticated": True,
         "user": {
@@ -803,7 +1124,9 @@ async def auth_status(
 async def logout(user_id: Optional[str] = Cookie(None)):
     """Log out user"""
     if user_id:
-        token_repository.delete_tokens(user_id)
+        await async_token_repository.delete_tokens(user_id)
+        google_cache.invalidate_user(user_id)
+        await run_blocking(google_sync_repository.clear_user, user_id)
     
     response = JSONResponse({"status": "logged out"})
     response.delete_cookie("user_id")
@@ -834,6 +1157,7 @@ class UserUpdate(BaseModel):
     title: Optional[str] = None
     location: Optional[str] = None
     system_prompt: Optional[str] = None
+    # Accepted for older clients but ignored — the server keeps the counters
     tasks_number: Optional[int] = 0
     chats_number: Optional[int] = 0
     pdfs_number: Optional[int] = 0
@@ -848,9 +1172,6 @@ def update_user(user_id: int, user: UserUpdate):
         "title": user.title,
         "location": user.location,
         "system_prompt": user.system_prompt,
-        "tasks_number": user.tasks_number,
-        "chats_number": user.chats_number,
-        "pdfs_number": user.pdfs_number,
         "picture_url": user.picture_url
     })
     updated = user_repository.get_user_by_id(user_id)
@@ -881,6 +1202,8 @@ async def upload_file(
 
     try:
         embed_on_upload(file_path, doc_type=doc_type, user_id=user_id)
+        await run_blocking(answer_cache.invalidate_user, user_id)
+        activity_counters.increment(user_id, pdfs=1)
     except Exception as e:
         os.remove(file_path)
         print(f"[Upload] Ingestion failed: {e}")
@@ -0,0 +1,44 @@
+import threading
+from collections import defaultdict
+
+
+# In-process counters and summaries, exposed through GET /metrics.
+# Each gunicorn worker keeps its own copy.
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_summaries = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+
+
+def increment(name: str, value: int = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, value: float):
+    """Record one sample (a duration, a size, a token count)"""
+    with _lock:
+        summary = _summaries[name]
+        summary["count"] += 1
+        summary["total"] += value
+        summary["max"] = max(summary["max"], value)
+
+
+def get_counter(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "summaries": {
+                name: {
+                    "count": s["count"],
+                    "avg": s["total"] / s["count"] if s["count"] else 0.0,
+                    "max": s["max"],
+                }
+                for name, s in _summaries.items()
+            },
+        }
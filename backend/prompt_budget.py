@@ -0,0 +1,126 @@
+import os
+
+import metrics
+
+
+PROMPT_MODEL = "gpt-4.1-mini"
+
+# Per-section token budgets for the chat prompt
+SECTION_BUDGETS = {
+    "google":  int(os.getenv("PROMPT_BUDGET_GOOGLE", "1000")),
+    "history": int(os.getenv("PROMPT_BUDGET_HISTORY", "1500")),
+    "memory":  int(os.getenv("PROMPT_BUDGET_MEMORY", "600")),
+    "rag":     int(os.getenv("PROMPT_BUDGET_RAG", "3000")),
+}
+# Ceiling for the whole prompt, system instructions and the query included
+PROMPT_BUDGET_TOTAL = int(os.getenv("PROMPT_BUDGET_TOTAL", "7000"))
+
+# When the total is over budget, sections give up tokens in this order
+TRIM_ORDER = ("history", "google", "memory", "rag")
+# Sections whose single best item may be cut short rather than dropped
+TRUNCATABLE = ("memory", "rag")
+# Role/separator tokens the API adds around each chat message
+MESSAGE_OVERHEAD = 4
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(PROMPT_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # tiktoken downloads its BPE files on first use; estimate if that fails
+            _encoding_failed = True
+            print(f"[Prompt] tiktoken unavailable, estimating tokens: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def fit_items(items: list, budget: int, truncatable: bool = False, overhead: int = 0) -> list:
+    """
+    items are (priority, text) pairs in display order; lower priority = more valuable.
+    Keeps the most valuable items that fit and returns (index, text) pairs in display order.
+    """
+    order = sorted(range(len(items)), key=lambda i: (items[i][0], i))
+    kept = {}
+    used = 0
+    for i in order:
+        cost = count_tokens(items[i][1]) + overhead
+        if used + cost > budget:
+            if not kept and truncatable:
+                kept[i] = truncate_to_tokens(items[i][1], budget - overhead)
+            break
+        kept[i] = items[i][1]
+        used += cost
+    return [(i, kept[i]) for i in sorted(kept) if kept[i]]
+
+
+def section_tokens(name: str, kept: list) -> int:
+    overhead = MESSAGE_OVERHEAD if name == "history" else 0
+    return sum(count_tokens(text) + overhead for _, text in kept)
+
+
+def budget_prompt(fixed: dict, sections: dict, budgets: dict = None, total_budget: int = PROMPT_BUDGET_TOTAL) -> tuple:
+    """
+    fixed:    {"system": str, "query": str} — always sent whole.
+    sections: {"google" | "history" | "memory" | "rag": [(priority, text), ...]}
+    Returns (kept, token_counts) where kept maps each section to the (index, text)
+    pairs that survived, in display order, and token_counts has one entry per section.
+    """
+    budgets = dict(budgets or SECTION_BUDGETS)
+
+    def fit(name):
+        return fit_items(
+            sections.get(name, []),
+            budgets.get(name, 0),
+            truncatable=name in TRUNCATABLE,
+            overhead=MESSAGE_OVERHEAD if name == "history" else 0,
+        )
+
+    kept = {name: fit(name) for name in sections}
+    counts = {name: count_tokens(text) for name, text in fixed.items()}
+    counts.update({name: section_tokens(name, texts) for name, texts in kept.items()})
+
+    # Over the overall ceiling — shrink the least valuable sections first
+    for name in TRIM_ORDER:
+        overflow = sum(counts.values()) - total_budget
+        if overflow <= 0:
+            break
+        if name not in kept or not counts[name]:
+            continue
+        budgets[name] = max(0, counts[name] - overflow)
+        kept[name] = fit(name)
+        counts[name] = section_tokens(name, kept[name])
+
+    counts["total"] = sum(counts.values())
+    for name, tokens in counts.items():
+        metrics.observe(f"prompt.tokens.{name}", tokens)
+    print("[Prompt] tokens " + " ".join(f"{name}={tokens}" for name, tokens in counts.items()))
+    return kept, counts
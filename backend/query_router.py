@@ -0,0 +1,229 @@
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import metrics
+
+
+ROUTES = ("RAG", "WEB", "LLM")
+
+# Minimum confidence for a local decision; anything below goes to the LLM router
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.6"))
+# Softmax temperature over centroid similarities — lower is more decisive
+CENTROID_TEMPERATURE = float(os.getenv("ROUTER_CENTROID_TEMPERATURE", "0.05"))
+# How much each rule hit multiplies a route's centroid probability
+RULE_BOOST = 1.0
+# Confidence assigned when the rules point at exactly one route
+RULE_CONFIDENCE = 0.9
+
+RECENT_DECISIONS_PER_USER = int(os.getenv("ROUTER_RECENT_DECISIONS", "64"))
+MAX_TRACKED_USERS = int(os.getenv("ROUTER_MAX_USERS", "1000"))
+# Print the fallback rate every N decisions
+LOG_EVERY = 50
+
+
+# ==================== RULES ====================
+
+RULES = {
+    "RAG": [
+        r"\b(my|our)\s+(own\s+)?(notes?|documents?|docs|files?|pdfs?|uploads?|slides|lectures?|syllabus|resume|cv|readings?|papers?|essays?|reports?)\b",
+        r"\b(uploaded|i uploaded|i shared|i sent you)\b",
+        r"\b(in|from) (the|that|this) (pdf|document|doc|file|paper|chapter|slide deck)\b",
+        r"\baccording to my\b",
+    ],
+    "WEB": [
+        r"\b(latest|breaking|current|recent)\s+(news|headlines|updates?|version|release|events?|prices?)\b",
+        r"\b(weather|forecast|temperature outside)\b",
+        r"\b(stock|share|crypto|bitcoin)\s+(price|market|quote)\b",
+        r"\b(who won|final score|live score|standings)\b",
+        r"\b(right now|as of today|this morning's|tonight's game)\b",
+    ],
+    "LLM": [
+        r"\b(my|the)\s+(calendar|schedule|agenda|meetings?|events?|tasks?|to-?dos?)\b",
+        r"^\s*(what is|what are|define|explain|how does|how do|why does|why do)\b(?!.*\b(my|our)\b)",
+        r"^\s*(write|draft|rewrite|translate|summarize this|brainstorm|give me ideas)\b",
+        r"^\s*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening))\b",
+    ],
+}
+
+_COMPILED_RULES = {
+    route: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for route, patterns in RULES.items()
+}
+
+
+# ==================== LABELLED EXAMPLES ====================
+
+LABELLED_EXAMPLES = {
+    "RAG": [
+        "Summarize my notes on operating systems",
+        "What did my lecture slides say about CNN architectures?",
+        "Find the section of my resume about internships",
+        "What does the PDF I uploaded say about the deadline?",
+        "Pull the key points from my project report",
+        "What were the main arguments in the paper I shared?",
+        "Explain the formula from chapter 3 of my course notes",
+        "Quote the relevant part of my lab writeup",
+    ],
+    "WEB": [
+        "What's the weather in Chicago tomorrow?",
+        "What are today's top news headlines?",
+        "What is the current price of Apple stock?",
+        "Who won the game last night?",
+        "What is the latest version of Python?",
+        "Are there any traffic delays on my commute right now?",
+        "What's happening in the election today?",
+        "When does the new iPhone come out?",
+    ],
+    "LLM": [
+        "Explain how a hash map works",
+        "What's on my calendar today?",
+        "Help me plan my week around my tasks",
+        "Write a polite email asking for an extension",
+        "What is the difference between TCP and UDP?",
+        "Give me a workout plan for beginners",
+        "Translate this sentence into Spanish",
+        "How should I prioritize my tasks this afternoon?",
+    ],
+}
+
+
+def _normalize(vector: list) -> list:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _dot(a: list, b: list) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def _decision_key(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class QueryRouter:
+    """
+    Picks RAG, WEB or LLM for a query without a chat-model round trip.
+    Regex rules decide the clear cases; otherwise the query embedding is compared
+    against per-route centroids built from LABELLED_EXAMPLES. Only when the
+    combined confidence is below the threshold is the LLM router consulted.
+    """
+
+    def __init__(self, embeddings, llm_fallback, threshold: float = ROUTER_CONFIDENCE_THRESHOLD):
+        self.embeddings = embeddings
+        self.llm_fallback = llm_fallback
+        self.threshold = threshold
+        self._centroids = None
+        self._centroid_lock = threading.Lock()
+        self._recent = OrderedDict()   # user_id -> OrderedDict(query -> route)
+        self._recent_lock = threading.Lock()
+
+    # ==================== CENTROIDS ====================
+
+    def _get_centroids(self) -> dict:
+        """Embed the labelled examples once per process"""
+        if self._centroids is None:
+            with self._centroid_lock:
+                if self._centroids is None:
+                    centroids = {}
+                    for route, examples in LABELLED_EXAMPLES.items():
+                        vectors = [_normalize(v) for v in self.embeddings.embed_documents(examples)]
+                        mean = [sum(col) / len(vectors) for col in zip(*vectors)]
+                        centroids[route] = _normalize(mean)
+                    self._centroids = centroids
+        return self._centroids
+
+    # ==================== RECENT DECISIONS ====================
+
+    def _get_recent(self, user_id: str, key: str):
+        with self._recent_lock:
+            decisions = self._recent.get(user_id)
+            if decisions is None or key not in decisions:
+                return None
+            self._recent.move_to_end(user_id)
+            decisions.move_to_end(key)
+            return decisions[key]
+
+    def _remember(self, user_id: str, key: str, route: str):
+        with self._recent_lock:
+            decisions = self._recent.setdefault(user_id, OrderedDict())
+            self._recent.move_to_end(user_id)
+            decisions[key] = route
+            decisions.move_to_end(key)
+            while len(decisions) > RECENT_DECISIONS_PER_USER:
+                decisions.popitem(last=False)
+            while len(self._recent) > MAX_TRACKED_USERS:
+                self._recent.popitem(last=False)
+
+    # ==================== SCORING ====================
+
+    def _rule_hits(self, query: str) -> dict:
+        return {
+            route: sum(1 for pattern in patterns if pattern.search(query))
+            for route, patterns in _COMPILED_RULES.items()
+        }
+
+    def _centroid_probabilities(self, query_embedding: list, rule_hits: dict) -> dict:
+        centroids = self._get_centroids()
+        query_vector = _normalize(query_embedding)
+        sims = {route: _dot(query_vector, centroid) for route, centroid in centroids.items()}
+        top = max(sims.values())
+        weights = {
+            route: math.exp((sim - top) / CENTROID_TEMPERATURE) * (1 + RULE_BOOST * rule_hits.get(route, 0))
+            for route, sim in sims.items()
+        }
+        total = sum(weights.values())
+        return {route: w / total for route, w in weights.items()}
+
+    def classify(self, query: str, query_embedding: list = None) -> tuple:
+        """Local decision only. Returns (route, confidence, method)."""
+        rule_hits = self._rule_hits(query)
+        matched = [route for route, hits in rule_hits.items() if hits]
+        if len(matched) == 1:
+            return matched[0], RULE_CONFIDENCE, "rules"
+
+        try:
+            if query_embedding is None:
+                query_embedding = self.embeddings.embed_query(query)
+            probabilities = self._centroid_probabilities(query_embedding, rule_hits)
+        except Exception as e:
+            print(f"[Router] Centroid check unavailable: {e}")
+            return "LLM", 0.0, "centroid"
+
+        route = max(probabilities, key=probabilities.get)
+        return route, probabilities[route], "centroid"
+
+    # ==================== ENTRY POINT ====================
+
+    def route(self, query: str, user_id: str = None, query_embedding: list = None) -> str:
+        """Returns 'RAG', 'WEB', or 'LLM'"""
+        key = _decision_key(query)
+        cache_user = user_id or "anonymous"
+
+        cached = self._get_recent(cache_user, key)
+        if cached:
+            metrics.increment("router.decisions")
+            metrics.increment("router.recent_hit")
+            print(f"[Router] Query classified as: {cached} (recent)")
+            return cached
+
+        route, confidence, method = self.classify(query, query_embedding)
+        if confidence < self.threshold:
+            method = "llm_fallback"
+            route = self.llm_fallback(query)
+
+        metrics.increment("router.decisions")
+        metrics.increment(f"router.{method}")
+        self._remember(cache_user, key, route)
+
+        print(f"[Router] Query classified as: {route} ({method}, confidence={confidence:.2f})")
+        self._log_fallback_rate()
+        return route
+
+    def _log_fallback_rate(self):
+        decisions = metrics.get_counter("router.decisions")
+        if decisions and decisions % LOG_EVERY == 0:
+            fallbacks = metrics.get_counter("router.llm_fallback")
+            print(f"[Router] LLM fallback rate: {fallbacks}/{decisions} ({fallbacks / decisions:.1%})")
@@ -1,17 +1,13 @@
 import os
 import chromadb
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 
 load_dotenv()
 
-embedding_model = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-    openai_api_key=os.getenv("OPENAI_API_KEY")
-)
+from embedding_cache import embedding_model
 
 # Chroma Cloud client — replaces local persist_directory
 chroma_client = chromadb.CloudClient(
@@ -0,0 +1,116 @@
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+import metrics
+from storage.postgres_pool import (
+    PG_POOL_MIN_SIZE,
+    PG_POOL_MAX_SIZE,
+    PG_POOL_ACQUIRE_TIMEOUT,
+    PG_POOL_HEALTHCHECK_IDLE_SECONDS,
+    PG_CONNECT_TIMEOUT,
+)
+
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(backend_dir, '.env'))
+
+
+class AsyncPostgresPool:
+    """
+    psycopg 3 AsyncConnectionPool for the async repositories, configured with
+    the same PG_POOL_* settings as the psycopg2 pool. Connections that sat idle
+    are health-checked on checkout; the pool commits on a clean exit from
+    connection() and rolls back when it raises.
+    """
+
+    def __init__(self, min_size: int = PG_POOL_MIN_SIZE, max_size: int = PG_POOL_MAX_SIZE,
+                 acquire_timeout: float = PG_POOL_ACQUIRE_TIMEOUT):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._pool = None
+        self._released_at = weakref.WeakKeyDictionary()   # conn -> monotonic time
+
+    # ==================== LIFECYCLE ====================
+
+    async def open(self):
+        """Open the pool on the running event loop (call from app startup)"""
+        if self._pool is not None:
+            return
+        db_url = os.getenv("DATABASE_URL")
+        if not db_url:
+            raise RuntimeError("DATABASE_URL not set — check your .env file")
+        pool = AsyncConnectionPool(
+            db_url,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            timeout=self.acquire_timeout,
+            kwargs={"row_factory": dict_row, "connect_timeout": PG_CONNECT_TIMEOUT},
+            check=self._check,
+            reset=self._mark_released,
+            open=False,
+        )
+        await pool.open()
+        self._pool = pool
+        print(f"[PgAsyncPool] Opened (min={self.min_size}, max={self.max_size})")
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    # ==================== HEALTH ====================
+
+    async def _mark_released(self, conn):
+        self._released_at[conn] = time.monotonic()
+
+    async def _check(self, conn):
+        released_at = self._released_at.get(conn)
+        if released_at is not None and time.monotonic() - released_at < PG_POOL_HEALTHCHECK_IDLE_SECONDS:
+            return
+        try:
+            await AsyncConnectionPool.check_connection(conn)
+        except Exception:
+            metrics.increment("pg_async_pool.health_check_failures")
+            raise
+
+    # ==================== ACQUIRE ====================
+
+    @asynccontextmanager
+    async def connection(self):
+        """async with async_pg_pool.connection() as conn: ..."""
+        if self._pool is None:
+            # Scripts and tests that skip the lifespan still get a pool
+            await self.open()
+        started = time.monotonic()
+        try:
+            async with self._pool.connection() as conn:
+                metrics.observe("pg_async_pool.wait_seconds", time.monotonic() - started)
+                metrics.increment("pg_async_pool.acquired")
+                yield conn
+        except PoolTimeout:
+            metrics.increment("pg_async_pool.timeouts")
+            raise
+
+    # ==================== INSPECTION ====================
+
+    def stats(self) -> dict:
+        if self._pool is None:
+            return {"size": 0, "idle": 0, "waiting": 0, "min_size": self.min_size, "max_size": self.max_size}
+        stats = self._pool.get_stats()
+        return {
+            "size": stats.get("pool_size", 0),
+            "idle": stats.get("pool_available", 0),
+            "waiting": stats.get("requests_waiting", 0),
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+        }
+
+
+async_pg_pool = AsyncPostgresPool()
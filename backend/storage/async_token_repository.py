@@ -0,0 +1,73 @@
+from psycopg.types.json import Jsonb
+
+from storage.async_postgres_pool import async_pg_pool
+from storage.identity_cache import identity_cache
+from storage.token_repository import (
+    SAVE_TOKENS_QUERY,
+    GET_TOKENS_QUERY,
+    UPDATE_REFRESHED_TOKENS_QUERY,
+    CLEAR_REFRESH_TOKEN_QUERY,
+    CLAIM_EXPIRING_TOKENS_QUERY,
+    RECORD_REFRESH_FAILURE_QUERY,
+    DELETE_TOKENS_QUERY,
+    save_tokens_params,
+    refreshed_tokens_params,
+    tokens_from_row,
+)
+
+
+# Async twin of token_repository on psycopg 3 — same function names and
+# return shapes, for use from async handlers. Schema lives in storage/migrations.
+
+def get_connection():
+    """Borrow a pooled connection: async with get_connection() as conn: ..."""
+    return async_pg_pool.connection()
+
+
+# ==================== CREATE / UPSERT ====================
+async def save_tokens(user_id: str, token_data: dict, profile: dict):
+    """See token_repository.save_tokens()"""
+    async with get_connection() as conn:
+        await conn.execute(SAVE_TOKENS_QUERY, save_tokens_params(user_id, token_data, Jsonb(profile)))
+    identity_cache.invalidate(user_id)
+
+
+# ==================== READ ====================
+async def get_tokens(user_id: str):
+    """See token_repository.tokens_from_row() for the shape"""
+    async with get_connection() as conn:
+        cursor = await conn.execute(GET_TOKENS_QUERY, (user_id,))
+        row = await cursor.fetchone()
+    return tokens_from_row(row)
+
+
+# ==================== REFRESH ====================
+async def update_refreshed_tokens(user_id: str, token_data: dict):
+    async with get_connection() as conn:
+        await conn.execute(UPDATE_REFRESHED_TOKENS_QUERY, refreshed_tokens_params(user_id, token_data))
+    identity_cache.invalidate(user_id)
+
+
+async def clear_refresh_token(user_id: str):
+    async with get_connection() as conn:
+        await conn.execute(CLEAR_REFRESH_TOKEN_QUERY, (user_id,))
+    identity_cache.invalidate(user_id)
+
+
+async def claim_expiring_tokens(within_seconds: int, login_within_seconds: int, limit: int, lease_seconds: int) -> list:
+    """See token_repository.claim_expiring_tokens()"""
+    async with get_connection() as conn:
+        cursor = await conn.execute(CLAIM_EXPIRING_TOKENS_QUERY, (lease_seconds, within_seconds, login_within_seconds, limit))
+        return await cursor.fetchall()
+
+
+async def record_refresh_failure(user_id: str, retry_seconds: int):
+    async with get_connection() as conn:
+        await conn.execute(RECORD_REFRESH_FAILURE_QUERY, (retry_seconds, user_id))
+
+
+# ==================== DELETE ====================
+async def delete_tokens(user_id: str):
+    async with get_connection() as conn:
+        await conn.execute(DELETE_TOKENS_QUERY, (user_id,))
+    identity_cache.invalidate(user_id)
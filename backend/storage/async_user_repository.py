@@ -0,0 +1,61 @@
+from storage.async_postgres_pool import async_pg_pool
+from storage.identity_cache import identity_cache
+from storage.user_repository import (
+    CREATE_USER_QUERY,
+    GET_USER_BY_GOOGLE_ID_QUERY,
+    GET_USER_BY_ID_QUERY,
+    GET_IDENTITY_QUERY,
+    UPDATE_USER_QUERY,
+    create_user_params,
+    update_user_params,
+    identity_from_row,
+)
+
+
+# Async twin of user_repository on psycopg 3 — same function names and
+# return shapes, for use from async handlers. Schema lives in storage/migrations.
+
+def get_connection():
+    """Borrow a pooled connection: async with get_connection() as conn: ..."""
+    return async_pg_pool.connection()
+
+# ==================== CREATE ====================
+async def create_user(user, google_id):
+    async with get_connection() as conn:
+        await conn.execute(CREATE_USER_QUERY, create_user_params(user, google_id))
+    identity_cache.invalidate(google_id)
+
+# ==================== READ ====================
+async def get_user_by_google_id(google_id):
+    async with get_connection() as conn:
+        cursor = await conn.execute(GET_USER_BY_GOOGLE_ID_QUERY, (google_id,))
+        return await cursor.fetchone()
+
+async def get_user_by_id(user_id):
+    async with get_connection() as conn:
+        cursor = await conn.execute(GET_USER_BY_ID_QUERY, (user_id,))
+        return await cursor.fetchone()
+
+
+async def get_identity(google_id):
+    """See user_repository.get_identity(); shares its cache"""
+    hit, identity, version = identity_cache.get(google_id)
+    if hit:
+        return identity
+
+    async with get_connection() as conn:
+        cursor = await conn.execute(GET_IDENTITY_QUERY, (google_id,))
+        identity = identity_from_row(await cursor.fetchone())
+    identity_cache.put(google_id, identity, version)
+    return identity
+
+# ==================== UPDATE ====================
+async def update_user(user_id, data):
+    try:
+        async with get_connection() as conn:
+            await conn.execute(UPDATE_USER_QUERY, update_user_params(user_id, data))
+            print(f"[UserRepository] Updated user {user_id} with data: {data}")
+    except Exception as e:
+        print(f"[UserRepository] Error updating user {user_id}: {e}")
+        raise
+    identity_cache.invalidate_user_id(user_id)
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+from langchain_core.messages import HumanMessage, AIMessage
+
+
+DB_PATH = "db/memory.db"
+
+# Messages kept per user, both in the ring buffer and in SQLite
+HISTORY_WINDOW   = int(os.getenv("CONVERSATION_HISTORY_WINDOW", "40"))
+# Users whose buffers stay in process before the least recently used is dropped
+MAX_ACTIVE_USERS = int(os.getenv("CONVERSATION_MAX_ACTIVE_USERS", "500"))
+
+
+def _to_message(role: str, content: str):
+    return HumanMessage(content=content) if role == "human" else AIMessage(content=content)
+
+
+class ConversationStore:
+    """
+    Per-user chat history. Requests without a user id get no history at all:
+    there is nothing to tell two anonymous visitors apart by.
+    Each active user gets a fixed-size ring buffer in process, kept behind an LRU.
+    SQLite is the source of truth, so any worker can serve any user: before a read
+    the buffer is checked against the latest sequence number and topped up if
+    another worker appended in the meantime.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, window: int = HISTORY_WINDOW, max_users: int = MAX_ACTIVE_USERS):
+        self.db_path = db_path
+        self.window = window
+        self.max_users = max_users
+        self._buffers = OrderedDict()   # user_id -> {"seq": int, "messages": deque}
+        self._lock = threading.Lock()
+
+    # ==================== CONNECTION ====================
+
+    def _connect(self):
+        """Tables come from storage/migrations/sqlite, applied at startup by migrate.check()"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    # ==================== BUFFER ====================
+
+    def _remember(self, user_id: str, buffer: dict, replaces: dict = None) -> dict:
+        """
+        Install a buffer in the LRU, evicting the coldest user if full. Only
+        replaces the buffer it was built from (or an older one); if another
+        thread already installed a newer one, that one is kept and returned.
+        """
+        with self._lock:
+            current = self._buffers.get(user_id)
+            if current is not None and current is not replaces and current["seq"] >= buffer["seq"]:
+                buffer = current
+            self._buffers[user_id] = buffer
+            self._buffers.move_to_end(user_id)
+            while len(self._buffers) > self.max_users:
+                self._buffers.popitem(last=False)
+        return buffer
+
+    def _sync(self, user_id: str, conn) -> dict:
+        """
+        Bring the in-process buffer up to date with SQLite. Installed buffers
+        are never modified: a top-up builds a new one and swaps it in, so
+        concurrent syncs can't append the same rows twice.
+        """
+        with self._lock:
+            cached = self._buffers.get(user_id)
+
+        row = conn.execute(
+            "SELECT MAX(seq) FROM conversation_messages WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        latest_seq = row[0] or 0
+
+        if cached is not None and latest_seq == cached["seq"]:
+            return self._remember(user_id, cached, replaces=cached)
+
+        if cached is None or latest_seq < cached["seq"]:
+            buffer = {"seq": 0, "messages": deque(maxlen=self.window)}
+        else:
+            buffer = {"seq": cached["seq"], "messages": deque(cached["messages"], maxlen=self.window)}
+
+        rows = conn.execute("""
+            SELECT seq, role, content FROM conversation_messages
+            WHERE user_id = ? AND seq > ?
+            ORDER BY seq DESC LIMIT ?
+        """, (user_id, buffer["seq"], self.window)).fetchall()
+        for seq, role, content in reversed(rows):
+            buffer["messages"].append(_to_message(role, content))
+        buffer["seq"] = latest_seq
+
+        return self._remember(user_id, buffer, replaces=cached)
+
+    # ==================== PUBLIC API ====================
+
+    def get_history(self, user_id: str, n: int = None) -> list:
+        """Last n messages for a user (the whole window if n is None)"""
+        if not user_id:
+            return []
+        conn = self._connect()
+        try:
+            messages = list(self._sync(user_id, conn)["messages"])
+        finally:
+            conn.close()
+        return messages[-n:] if n else messages
+
+    def append_turn(self, user_id: str, user_message: str, reply: str) -> int:
+        """
+        Persist one user/assistant exchange.
+        Returns the user's total message count, used for the summarization trigger
+        (0 for anonymous requests, which aren't stored).
+        """
+        if not user_id:
+            return 0
+        conn = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front so concurrent workers can't reuse a seq
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT MAX(seq) FROM conversation_messages WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            seq = row[0] or 0
+            conn.executemany(
+                "INSERT INTO conversation_messages (user_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                [(user_id, seq + 1, "human", user_message), (user_id, seq + 2, "ai", reply)]
+            )
+            # Only the ring-buffer window is worth keeping
+            conn.execute(
+                "DELETE FROM conversation_messages WHERE user_id = ? AND seq <= ?",
+                (user_id, seq + 2 - self.window)
+            )
+            conn.commit()
+            self._sync(user_id, conn)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return seq + 2
+
+
+conversation_store = ConversationStore()
@@ -0,0 +1,185 @@
+import os
+import json
+import psycopg2.extras
+from dotenv import load_dotenv
+
+from storage.postgres_pool import pg_pool
+
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(backend_dir, '.env'))
+
+
+def get_connection():
+    """Borrow a pooled connection: with get_connection() as conn: ..."""
+    return pg_pool.connection()
+
+
+# ==================== SYNC STATE ====================
+def get_sync_token(user_id: str, resource: str):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT sync_token FROM google_sync_state WHERE user_id = %s AND resource = %s",
+            (user_id, resource)
+        )
+        row = cursor.fetchone()
+    return row["sync_token"] if row else None
+
+
+def get_sync_state(user_id: str, resource: str):
+    """{"sync_token", "window_end"} or None if the resource was never synced"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT sync_token, window_end FROM google_sync_state WHERE user_id = %s AND resource = %s",
+            (user_id, resource)
+        )
+        return cursor.fetchone()
+
+
+def _save_sync_token(cursor, user_id: str, resource: str, sync_token: str, window_end=None):
+    """A missing token or window keeps the stored one"""
+    cursor.execute("""
+        INSERT INTO google_sync_state (user_id, resource, sync_token, window_end, synced_at)
+        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id, resource) DO UPDATE SET
+            sync_token = COALESCE(EXCLUDED.sync_token, google_sync_state.sync_token),
+            window_end = COALESCE(EXCLUDED.window_end, google_sync_state.window_end),
+            synced_at  = CURRENT_TIMESTAMP
+    """, (user_id, resource, sync_token, window_end))
+
+
+def clear_user(user_id: str):
+    """Forget the mirror and sync tokens for a user (e.g. on logout)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM calendar_events WHERE user_id = %s", (user_id,))
+        cursor.execute("DELETE FROM google_tasks WHERE user_id = %s", (user_id,))
+        cursor.execute("DELETE FROM google_sync_state WHERE user_id = %s", (user_id,))
+        conn.commit()
+
+
+# ==================== CALENDAR MIRROR ====================
+def apply_calendar_changes(user_id: str, upserts: list, deleted_ids: list, sync_token: str, full: bool = False,
+                           window_end=None):
+    """
+    Apply one sync's worth of changes in a single transaction.
+    upserts are (event_id, start_time, end_time, event_dict) tuples.
+    full=True replaces the user's mirror outright; window_end is the end of
+    the time window a full sync covered.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if full:
+                cursor.execute("DELETE FROM calendar_events WHERE user_id = %s", (user_id,))
+            if deleted_ids:
+                cursor.execute(
+                    "DELETE FROM calendar_events WHERE user_id = %s AND event_id = ANY(%s)",
+                    (user_id, list(deleted_ids))
+                )
+            if upserts:
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO calendar_events (user_id, event_id, start_time, end_time, event_json, updated_at)
+                    VALUES %s
+                    ON CONFLICT (user_id, event_id) DO UPDATE SET
+                        start_time = EXCLUDED.start_time,
+                        end_time   = EXCLUDED.end_time,
+                        event_json = EXCLUDED.event_json,
+                        updated_at = CURRENT_TIMESTAMP
+                """, [
+                    (user_id, event_id, start, end, json.dumps(event))
+                    for event_id, start, end, event in upserts
+                ], template="(%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)")
+            # Past events are never served, so don't keep them around
+            cursor.execute(
+                "DELETE FROM calendar_events WHERE user_id = %s AND end_time < CURRENT_TIMESTAMP - INTERVAL '1 day'",
+                (user_id,)
+            )
+            _save_sync_token(cursor, user_id, "calendar", sync_token, window_end)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def get_upcoming_events(user_id: str, limit: int = 50) -> list:
+    """Events that haven't ended yet, soonest first — same shape as the Calendar API items"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT event_json FROM calendar_events
+            WHERE user_id = %s AND (end_time IS NULL OR end_time >= CURRENT_TIMESTAMP)
+            ORDER BY start_time
+            LIMIT %s
+        """, (user_id, limit))
+        rows = cursor.fetchall()
+    return [row["event_json"] for row in rows]
+
+
+# ==================== TASKS MIRROR ====================
+def apply_task_changes(user_id: str, upserts: list, deleted_ids: list, task_lists: list,
+                       sync_token: str, full: bool = False):
+    """
+    upserts are (task_id, list_id, position, task_dict) tuples.
+    task_lists are (list_id, list_index, list_title) for every list the user has now;
+    tasks in lists that no longer exist are dropped and the rest pick up renames/reorders.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if full:
+                cursor.execute("DELETE FROM google_tasks WHERE user_id = %s", (user_id,))
+            if deleted_ids:
+                cursor.execute(
+                    "DELETE FROM google_tasks WHERE user_id = %s AND task_id = ANY(%s)",
+                    (user_id, list(deleted_ids))
+                )
+            cursor.execute(
+                "DELETE FROM google_tasks WHERE user_id = %s AND NOT (list_id = ANY(%s))",
+                (user_id, [list_id for list_id, _, _ in task_lists])
+            )
+            if upserts:
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO google_tasks (user_id, task_id, list_id, position, task_json, updated_at)
+                    VALUES %s
+                    ON CONFLICT (user_id, task_id) DO UPDATE SET
+                        list_id    = EXCLUDED.list_id,
+                        position   = EXCLUDED.position,
+                        task_json  = EXCLUDED.task_json,
+                        updated_at = CURRENT_TIMESTAMP
+                """, [
+                    (user_id, task_id, list_id, position, json.dumps(task))
+                    for task_id, list_id, position, task in upserts
+                ], template="(%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)")
+            if task_lists:
+                psycopg2.extras.execute_values(cursor, """
+                    UPDATE google_tasks AS t
+                    SET list_index = v.list_index, list_title = v.list_title
+                    FROM (VALUES %s) AS v (user_id, list_id, list_index, list_title)
+                    WHERE t.user_id = v.user_id AND t.list_id = v.list_id
+                      AND (t.list_index IS DISTINCT FROM v.list_index OR t.list_title IS DISTINCT FROM v.list_title)
+                """, [
+                    (user_id, list_id, list_index, list_title)
+                    for list_id, list_index, list_title in task_lists
+                ])
+            _save_sync_token(cursor, user_id, "tasks", sync_token)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def get_tasks(user_id: str) -> list:
+    """Pending tasks in list order, then Google's position within each list"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT task_json || jsonb_build_object('listTitle', COALESCE(list_title, 'My Tasks')) AS task_json
+            FROM google_tasks
+            WHERE user_id = %s
+            ORDER BY list_index, position
+        """, (user_id,))
+        rows = cursor.fetchall()
+    return [row["task_json"] for row in rows]
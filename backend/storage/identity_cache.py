@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "30"))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "5000"))
+
+
+class IdentityCache:
+    """
+    Per-process TTL cache of user_repository.get_identity() results, keyed by
+    Google user id. The repositories invalidate entries on every write to
+    users or user_tokens; the TTL bounds staleness from writes made by other
+    worker processes.
+    """
+
+    def __init__(self, ttl_seconds: float = IDENTITY_CACHE_TTL_SECONDS, max_entries: int = IDENTITY_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # google_id -> (identity, cached_at)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a read that raced a write isn't cached
+        self._version = 0
+
+    def get(self, google_id: str):
+        """Returns (hit, identity, version); pass version back to put() after a miss"""
+        with self._lock:
+            entry = self._entries.get(google_id)
+            if entry and time.monotonic() - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(google_id)
+                metrics.increment("identity_cache.hit")
+                return True, entry[0], self._version
+            version = self._version
+        metrics.increment("identity_cache.miss")
+        return False, None, version
+
+    def put(self, google_id: str, identity: dict, version: int):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[google_id] = (identity, time.monotonic())
+            self._entries.move_to_end(google_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, google_id: str):
+        with self._lock:
+            self._version += 1
+            self._entries.pop(google_id, None)
+
+    def add_counts(self, google_id: str, deltas: dict):
+        """
+        Apply activity counter deltas ({column: delta}) to a cached identity.
+        Counter-only writes use this instead of invalidate(), so they don't
+        bump the version and empty the cache for every active user.
+        """
+        with self._lock:
+            entry = self._entries.get(google_id)
+            if not entry or not entry[0]["user"]:
+                return
+            identity, cached_at = entry
+            user = dict(identity["user"])   # callers may still hold the old dict
+            for column, delta in deltas.items():
+                user[column] = (user.get(column) or 0) + delta
+            self._entries[google_id] = (dict(identity, user=user), cached_at)
+
+    def invalidate_user_id(self, user_id: int):
+        """For writes keyed by users.id rather than the Google id"""
+        with self._lock:
+            self._version += 1
+            stale = [
+                google_id for google_id, (identity, _) in self._entries.items()
+                if identity["user"] and identity["user"]["id"] == user_id
+            ]
+            for google_id in stale:
+                del self._entries[google_id]
+
+
+identity_cache = IdentityCache()
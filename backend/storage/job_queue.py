@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import traceback
+
+import metrics
+
+
+DB_PATH = "db/memory.db"
+
+JOB_WORKERS        = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS   = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE     = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+# A running job whose lease has expired is assumed lost (worker crashed) and is picked up again
+JOB_LEASE_SECONDS  = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Idle workers re-check the table this often, for jobs enqueued by other processes
+JOB_POLL_SECONDS   = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# Finished jobs are kept this long for inspection
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+
+class JobQueue:
+    """
+    Persistent background job queue.
+    Jobs live in SQLite so they survive restarts and can be picked up by any
+    worker process; asyncio tasks in each process claim and run them. Jobs for
+    the same user run strictly in enqueue order, failures are retried with
+    exponential backoff, and stats() reports queue depth. Every claim counts as
+    an attempt, including re-claiming a job whose worker crashed or hung, so
+    no job runs more than max_attempts times.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, workers: int = JOB_WORKERS, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._handlers = {}
+        self._tasks = []
+        self._wakeup = None
+        self._loop = None
+        self._executor = None
+
+    # ==================== CONNECTION ====================
+
+    def _connect(self):
+        """Tables come from storage/migrations/sqlite, applied at startup by migrate.check()"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    # ==================== PRODUCER ====================
+
+    def register(self, kind: str, handler):
+        """handler(user_id, payload) — a plain function, run on the executor"""
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, user_id: str, payload: dict = None) -> int:
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute("""
+                INSERT INTO jobs (kind, user_id, payload, status, run_after, created_at, updated_at)
+                VALUES (?, ?, ?, 'pending', ?, ?, ?)
+            """, (kind, user_id, json.dumps(payload or {}), now, now, now))
+            conn.commit()
+            job_id = cursor.lastrowid
+        finally:
+            conn.close()
+
+        metrics.increment(f"jobs.enqueued.{kind}")
+        if self._wakeup:
+            # enqueue() may be called from executor threads
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    # ==================== CONSUMER ====================
+
+    def _claim(self):
+        """Atomically take the next runnable job, respecting per-user order"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Lost jobs that already used up their attempts don't get another one
+            lost = conn.execute("""
+                UPDATE jobs
+                SET status = 'failed', locked_until = NULL, updated_at = ?,
+                    last_error = 'Lease expired on the final attempt (worker crashed or hung)'
+                WHERE status = 'running' AND locked_until < ? AND attempts >= ?
+            """, (now, now, self.max_attempts)).rowcount
+            if lost:
+                metrics.increment("jobs.lost", lost)
+            row = conn.execute("""
+                SELECT id, kind, user_id, payload, attempts FROM jobs j
+                WHERE (
+                        (j.status = 'pending' AND j.run_after <= ?)
+                     OR (j.status = 'running' AND j.locked_until < ?)
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM jobs e
+                      WHERE e.user_id = j.user_id
+                        AND e.id < j.id
+                        AND e.status IN ('pending', 'running')
+                  )
+                ORDER BY j.id
+                LIMIT 1
+            """, (now, now)).fetchone()
+            if not row:
+                conn.commit()
+                return None
+            conn.execute("""
+                UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ?, updated_at = ?
+                WHERE id = ?
+            """, (now + JOB_LEASE_SECONDS, now, row[0]))
+            conn.commit()
+        finally:
+            conn.close()
+
+        job_id, kind, user_id, payload, attempts = row
+        # attempts includes this run
+        return {"id": job_id, "kind": kind, "user_id": user_id, "payload": json.loads(payload), "attempts": attempts + 1}
+
+    def _finish(self, job: dict, error: str = None):
+        now = time.time()
+        conn = self._connect()
+        try:
+            if error is None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'done', locked_until = NULL, updated_at = ? WHERE id = ?",
+                    (now, job["id"])
+                )
+            else:
+                attempts = job["attempts"]
+                if attempts >= self.max_attempts:
+                    status, run_after = "failed", now
+                else:
+                    status, run_after = "pending", now + JOB_RETRY_BASE * (2 ** (attempts - 1))
+                conn.execute("""
+                    UPDATE jobs
+                    SET status = ?, run_after = ?, locked_until = NULL,
+                        last_error = ?, updated_at = ?
+                    WHERE id = ?
+                """, (status, run_after, error, now, job["id"]))
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (now - JOB_RETENTION_SECONDS,)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def _run_in_executor(self, func, *args):
+        return await self._loop.run_in_executor(self._executor, func, *args)
+
+    async def _worker(self, index: int):
+        while True:
+            # Cleared before claiming so an enqueue during the claim still wakes us
+            self._wakeup.clear()
+            try:
+                job = await self._run_in_executor(self._claim)
+            except Exception as e:
+                print(f"[Jobs] Claim failed: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            handler = self._handlers.get(job["kind"])
+            started = time.monotonic()
+            try:
+                if handler is None:
+                    raise RuntimeError(f"No handler registered for job kind '{job['kind']}'")
+                await self._run_in_executor(handler, job["user_id"], job["payload"])
+                error = None
+                metrics.increment(f"jobs.succeeded.{job['kind']}")
+            except Exception as e:
+                traceback.print_exc()
+                error = f"{type(e).__name__}: {e}"
+                metrics.increment(f"jobs.failed_attempts.{job['kind']}")
+                print(f"[Jobs] {job['kind']} #{job['id']} for user {job['user_id']} failed (attempt {job['attempts']}): {error}")
+            metrics.observe(f"jobs.duration_seconds.{job['kind']}", time.monotonic() - started)
+
+            try:
+                await self._run_in_executor(self._finish, job, error)
+            except Exception as e:
+                # Lease expiry will hand the job to another worker
+                print(f"[Jobs] Could not record result of job #{job['id']}: {e}")
+
+    def start(self, executor=None):
+        """Spawn the worker tasks on the running event loop (call from app startup)"""
+        self._loop = asyncio.get_running_loop()
+        self._executor = executor
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"[Jobs] Started {self.workers} worker(s)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    # ==================== INSPECTION ====================
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'pending'").fetchone()[0]
+            by_kind = dict(conn.execute(
+                "SELECT kind, COUNT(*) FROM jobs WHERE status IN ('pending', 'running') GROUP BY kind"
+            ).fetchall())
+        finally:
+            conn.close()
+        return {
+            "depth": counts.get("pending", 0) + counts.get("running", 0),
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "failed": counts.get("failed", 0),
+            "done": counts.get("done", 0),
+            "by_kind": by_kind,
+            "oldest_pending_age_seconds": round(time.time() - oldest, 1) if oldest else 0,
+        }
+
+
+job_queue = JobQueue()
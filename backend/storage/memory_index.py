@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+
+# RAM the resident users' vectors may use before the least recently used is dropped
+MEMORY_INDEX_MAX_BYTES   = int(os.getenv("MEMORY_INDEX_MAX_BYTES", str(256 * 1024 * 1024)))
+# Bounds staleness from memories written or moved by other worker processes
+MEMORY_INDEX_TTL_SECONDS = float(os.getenv("MEMORY_INDEX_TTL_SECONDS", "60"))
+
+
+class TierVectors:
+    """One user's vectors in one memory tier: a row-normalised matrix and its documents"""
+
+    def __init__(self, embeddings, documents: list, relevance):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if not documents:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+        self.documents = documents
+        self.relevance = relevance   # cosine similarities -> the store's relevance scores
+        self.nbytes = self.matrix.nbytes + sum(len(doc.page_content) for doc in documents)
+
+    def top_k(self, query_vector: np.ndarray, k: int) -> list:
+        if not self.documents:
+            return []
+        similarities = self.matrix @ query_vector
+        k = min(k, len(self.documents))
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best])]
+        relevance = self.relevance(similarities[best])
+        return [(self.documents[i], float(score)) for i, score in zip(best, relevance)]
+
+
+class UserVectorIndex:
+    """
+    Per-process, in-RAM copy of each active user's memory vectors, so a memory
+    search is an exact dot product over a few hundred rows instead of an HNSW
+    query filtered across every user. loader(user_id) returns
+    {tier_name: TierVectors} and runs on a user's first search; users are then
+    evicted least-recently-used once MEMORY_INDEX_MAX_BYTES is exceeded.
+    search() returns None when the user can't be held in RAM, and the caller
+    falls back to the on-disk store.
+    """
+
+    def __init__(self, loader, max_bytes: int = MEMORY_INDEX_MAX_BYTES, ttl_seconds: float = MEMORY_INDEX_TTL_SECONDS):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._users = OrderedDict()   # user_id -> (tiers, nbytes, loaded_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loads = {}              # user_id -> [threading.Lock, loads waiting or running], so tiers load once
+        # Per user, bumped by invalidations while a load is in flight, so a load
+        # that raced a write to that user isn't kept; dropped with the user's last load
+        self._versions = {}
+
+    def _fresh(self, user_id: str):
+        """The user's tiers if resident and within the TTL; call with self._lock held"""
+        entry = self._users.get(user_id)
+        if entry and time.monotonic() - entry[2] < self.ttl_seconds:
+            self._users.move_to_end(user_id)
+            return entry[0]
+        return None
+
+    def _get(self, user_id: str):
+        with self._lock:
+            tiers = self._fresh(user_id)
+        metrics.increment("memory_index.hit" if tiers is not None else "memory_index.miss")
+        return tiers
+
+    def _put(self, user_id: str, tiers: dict, version: int) -> bool:
+        nbytes = sum(vectors.nbytes for vectors in tiers.values())
+        if nbytes > self.max_bytes:
+            metrics.increment("memory_index.too_large")
+            return False
+        with self._lock:
+            if version != self._versions.get(user_id, 0):
+                return True   # usable for this search, just not worth keeping
+            self._drop(user_id)
+            self._users[user_id] = (tiers, nbytes, time.monotonic())
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                evicted, (_, evicted_bytes, _) = self._users.popitem(last=False)
+                self._bytes -= evicted_bytes
+                metrics.increment("memory_index.evicted")
+        return True
+
+    def _drop(self, user_id: str):
+        entry = self._users.pop(user_id, None)
+        if entry:
+            self._bytes -= entry[1]
+
+    def search(self, user_id: str, tier: str, query_embedding, k: int):
+        """[(doc, relevance)] best first, or None to fall back to the on-disk store"""
+        tiers = self._get(user_id)
+        if tiers is None:
+            tiers = self._load(user_id)
+            if tiers is None:
+                return None
+        vectors = tiers.get(tier)
+        if vectors is None:
+            return None
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        return vectors.top_k(query_vector / norm if norm else query_vector, k)
+
+    def _load(self, user_id: str):
+        with self._lock:
+            load = self._loads.setdefault(user_id, [threading.Lock(), 0])
+            load[1] += 1
+        try:
+            with load[0]:
+                with self._lock:
+                    tiers = self._fresh(user_id)   # loaded while we waited; already counted as a miss
+                    version = self._versions.get(user_id, 0)
+                if tiers is not None:
+                    return tiers
+                started = time.monotonic()
+                try:
+                    tiers = self.loader(user_id)
+                except Exception as e:
+                    metrics.increment("memory_index.load_failures")
+                    print(f"[MemoryIndex] Loading user {user_id} failed: {e}")
+                    return None
+                metrics.observe("memory_index.load_seconds", time.monotonic() - started)
+                return tiers if self._put(user_id, tiers, version) else None
+        finally:
+            with self._lock:
+                load[1] -= 1
+                if not load[1]:
+                    del self._loads[user_id]
+                    self._versions.pop(user_id, None)
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            if user_id in self._loads:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._drop(user_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._users), "bytes": self._bytes, "max_bytes": self.max_bytes}
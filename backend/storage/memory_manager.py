@@ -1,26 +1,185 @@
+import asyncio
 import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from langchain_community.embeddings import OpenAIEmbeddings
 import sqlite3
 
-from storage.database import init_memory_db
-
-embedding_model = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-    openai_api_key=os.getenv("OPENAI_API_KEY")
-)
+import metrics
+from blocking_io import run_blocking
+from embedding_cache import embedding_model
+from storage.memory_index import TierVectors, UserVectorIndex
 
 SHORT_TERM_DIR = "db/chroma_short_term"
 LONG_TERM_DIR  = "db/chroma_long_term"
+MEMORY_DB_PATH = "db/memory.db"
+TIER_DIRS = {"short": SHORT_TERM_DIR, "long": LONG_TERM_DIR}
+
+# Buffered access hits are written every MEMORY_FLUSH_SECONDS, or sooner
+# once MEMORY_FLUSH_BATCH_SIZE hits are waiting
+MEMORY_FLUSH_SECONDS    = float(os.getenv("MEMORY_FLUSH_SECONDS", "5"))
+MEMORY_FLUSH_BATCH_SIZE = int(os.getenv("MEMORY_FLUSH_BATCH_SIZE", "200"))
+# How often the background demotion pass runs
+MEMORY_DEMOTE_INTERVAL_SECONDS = float(os.getenv("MEMORY_DEMOTE_INTERVAL_SECONDS", "3600"))
+# Vectors copied between the Chroma tiers per round trip
+MEMORY_MOVE_BATCH_SIZE = int(os.getenv("MEMORY_MOVE_BATCH_SIZE", "100"))
 
 # Thresholds
+MIN_RELEVANCE        = 0.5    # similarity a memory needs to be returned at all
+RECENCY_WEIGHT       = float(os.getenv("MEMORY_RECENCY_WEIGHT", "0.2"))   # rank boost for frequent / recent memories
 SHORT_TERM_THRESHOLD = 0.15   # minimum score to stay in short-term
 PROMOTION_THRESHOLD  = 5      # frequency hits before staying short-term permanently
 TIER_SHIFT_DAYS      = 30     # days of no access before demotion to long-term
 
 
+# ==================== STORE ====================
+
+class MemoryStore:
+    """
+    Process-wide handles to the short- and long-term Chroma tiers.
+    Each tier is opened once (lazily, or up front via open()) and reused for
+    every search and write, so requests don't pay for reopening the SQLite
+    store and reloading the HNSW index. Reads run concurrently; writes to a
+    tier are serialised.
+    """
+
+    def __init__(self, embedding_function=embedding_model, tier_dirs=(SHORT_TERM_DIR, LONG_TERM_DIR)):
+        self.embedding_function = embedding_function
+        self.tier_dirs = tier_dirs
+        self._tiers = {}                 # persist_dir -> Chroma
+        self._write_locks = {}           # persist_dir -> threading.Lock
+        self._open_lock = threading.Lock()
+
+    def open(self):
+        """Open every tier now (call from app startup) instead of on first use"""
+        for persist_dir in self.tier_dirs:
+            self.tier(persist_dir)
+
+    def tier(self, persist_dir: str) -> Chroma:
+        db = self._tiers.get(persist_dir)
+        if db is not None:
+            return db
+        with self._open_lock:
+            db = self._tiers.get(persist_dir)
+            if db is None:
+                db = Chroma(
+                    persist_directory=persist_dir,
+                    embedding_function=self.embedding_function
+                )
+                self._write_locks[persist_dir] = threading.Lock()
+                self._tiers[persist_dir] = db
+                print(f"[Memory] Opened tier {persist_dir}")
+        return db
+
+    def search_by_vector(self, query_embedding: list, persist_dir: str, user_id: str, k: int = 2) -> list:
+        """[(doc, relevance)] for an already-embedded query; relevance in [0, 1] like similarity_search_with_relevance_scores"""
+        db = self.tier(persist_dir)
+        results = db.similarity_search_by_vector_with_relevance_scores(
+            query_embedding,
+            k=k,
+            filter={"user_id": user_id}
+        )
+        relevance = db._select_relevance_score_fn()
+        return [(doc, relevance(distance)) for doc, distance in results]
+
+    def add(self, documents: list, persist_dir: str, ids: list = None):
+        db = self.tier(persist_dir)
+        with self._write_locks[persist_dir]:
+            db.add_documents(documents, ids=ids)
+
+    def load_user_vectors(self, persist_dir: str, user_id: str) -> TierVectors:
+        """All of a user's vectors in one tier, for the in-RAM index"""
+        db = self.tier(persist_dir)
+        found = db.get(where={"user_id": user_id}, include=["embeddings", "documents", "metadatas"])
+        documents = [
+            Document(page_content=text, metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        ]
+
+        # Same relevance scores as a Chroma search: turn cosine similarity
+        # (vectors are unit length) into the collection's distance first
+        space = (db._collection.metadata or {}).get("hnsw:space", "l2")
+        to_relevance = db._select_relevance_score_fn()
+        if space == "l2":
+            to_distance = lambda cosine: 2 - 2 * cosine   # Chroma reports squared L2
+        else:
+            to_distance = lambda cosine: 1 - cosine
+        return TierVectors(found["embeddings"], documents, lambda cosines: [to_relevance(to_distance(c)) for c in cosines])
+
+    # ==================== TIER MOVES ====================
+    # Stored vectors are copied as-is, so moving a memory never re-embeds it
+
+    def get_vectors(self, persist_dir: str, embedding_ids: list) -> dict:
+        """Chroma get() result (ids, embeddings, documents, metadatas) for these memories"""
+        return self.tier(persist_dir).get(
+            where={"embedding_id": {"$in": embedding_ids}},
+            include=["embeddings", "documents", "metadatas"]
+        )
+
+    def upsert_vectors(self, persist_dir: str, ids: list, embeddings, documents: list, metadatas: list):
+        db = self.tier(persist_dir)
+        with self._write_locks[persist_dir]:
+            db._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete_vectors(self, persist_dir: str, embedding_ids: list):
+        db = self.tier(persist_dir)
+        with self._write_locks[persist_dir]:
+            db.delete(where={"embedding_id": {"$in": embedding_ids}})
+
+
+memory_store = MemoryStore()
+
+
+def _load_user_memories(user_id: str) -> dict:
+    return {persist_dir: memory_store.load_user_vectors(persist_dir, user_id) for persist_dir in memory_store.tier_dirs}
+
+
+# Hot users' memories in RAM; search_memory_tier falls back to Chroma when a user isn't held
+memory_index = UserVectorIndex(_load_user_memories)
+
+
+# ==================== METADATA DB ====================
+
+class MemoryDB:
+    """
+    One long-lived connection to db/memory.db, shared by every thread and
+    used under a lock. The file runs in WAL mode so readers (and the
+    conversation store's connections) aren't blocked by a write.
+    """
+
+    def __init__(self, db_path: str = MEMORY_DB_PATH):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """with memory_db.connection() as conn: ... (holds the lock throughout)"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            yield self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+memory_db = MemoryDB()
+
+
 # ==================== SCORING ====================
 
 def compute_score(frequency: int, last_accessed: datetime) -> float:
@@ -40,69 +199,100 @@ def get_conversational_context(chat_history: list, n: int = 10) -> list:
     return chat_history[-n:]
 
 
-def search_memory_tier(query: str, persist_dir: str, user_id: str, k: int = 2) -> list:
-    """Search a specific ChromaDB tier for relevant memories"""
+def search_memory_tier(query_embedding: list, persist_dir: str, user_id: str, k: int = 2) -> list:
+    """Search a specific ChromaDB tier for relevant memories. Returns [(doc, relevance)]."""
     try:
-        db = Chroma(
-            persist_directory=persist_dir,
-            embedding_function=embedding_model
-        )
-        results = db.similarity_search_with_relevance_scores(
-            query,
-            k=k,
-            filter={"user_id": user_id}
-        )
+        results = memory_index.search(user_id, persist_dir, query_embedding, k)
+        if results is None:
+            metrics.increment("memory_index.fallback")
+            results = memory_store.search_by_vector(query_embedding, persist_dir, user_id, k=k)
         # Only return results above similarity threshold
-        return [doc for doc, score in results if score > 0.5]
+        return [(doc, score) for doc, score in results if score > MIN_RELEVANCE]
     except Exception as e:
         print(f"[Memory] Search failed in {persist_dir}: {e}")
         return []
 
 
-def retrieve_memory(query: str, user_id: str, conn) -> dict:
+def access_scores(embedding_ids: list) -> dict:
+    """embedding_id -> compute_score() from the stored frequency / last_accessed"""
+    if not embedding_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in embedding_ids)
+    with memory_db.connection() as conn:
+        rows = conn.execute(
+            f"SELECT embedding_id, frequency, last_accessed FROM memories WHERE embedding_id IN ({placeholders})",
+            embedding_ids
+        ).fetchall()
+    scores = {}
+    for embedding_id, frequency, last_accessed in rows:
+        if isinstance(last_accessed, str):
+            last_accessed = datetime.fromisoformat(last_accessed)
+        scores[embedding_id] = compute_score(frequency, last_accessed)
+    return scores
+
+
+async def retrieve_memory(query: str, user_id: str, query_embedding: list = None, k: int = 2) -> dict:
     """
-    Waterfall through all three layers.
+    Layers 2 + 3: search both tiers at once with one query embedding (pass
+    the request's own to skip embedding here) and keep the k best memories.
+    Ranking is similarity plus a RECENCY_WEIGHT boost from compute_score(),
+    so of two equally close memories the frequently / recently used one wins.
     Returns whatever context was found and which tier it came from.
+    Hits are recorded in memory_hits and written to SQLite in batches.
     """
-    # Layer 2 — short-term
-    short_results = search_memory_tier(query, SHORT_TERM_DIR, user_id)
-    if short_results:
-        # Update frequency + recency for each hit
-        for doc in short_results:
-            embedding_id = doc.metadata.get("embedding_id")
-            if embedding_id:
-                bump_memory_score(embedding_id, conn)
-        return {
-            "context": "\n---\n".join([d.page_content for d in short_results]),
-            "tier": "short_term"
-        }
+    if query_embedding is None:
+        query_embedding = await embedding_model.aembed_query(query)
 
-    # Layer 3 — long-term (only if short-term missed)
-    long_results = search_memory_tier(query, LONG_TERM_DIR, user_id)
-    if long_results:
-        for doc in long_results:
-            embedding_id = doc.metadata.get("embedding_id")
-            if embedding_id:
-                bump_memory_score(embedding_id, conn)
-                maybe_promote(embedding_id, conn)  # promote back to short-term if accessed again
-        return {
-            "context": "\n---\n".join([d.page_content for d in long_results]),
-            "tier": "long_term"
-        }
+    short_results, long_results = await asyncio.gather(
+        run_blocking(search_memory_tier, query_embedding, SHORT_TERM_DIR, user_id, k),
+        run_blocking(search_memory_tier, query_embedding, LONG_TERM_DIR, user_id, k),
+    )
+    candidates = [(doc, score, "short_term") for doc, score in short_results] \
+               + [(doc, score, "long_term") for doc, score in long_results]
+    if not candidates:
+        return {"context": "", "entries": [], "tier": "none"}
+
+    scores = await run_blocking(access_scores, [doc.metadata.get("embedding_id") for doc, _, _ in candidates])
+
+    def rank(candidate):
+        doc, similarity, _ = candidate
+        access = scores.get(doc.metadata.get("embedding_id"), 0.0)
+        return similarity + RECENCY_WEIGHT * access / (access + 1)   # boost bounded by RECENCY_WEIGHT
 
-    return {"context": "", "tier": "none"}
+    best = sorted(candidates, key=rank, reverse=True)[:k]
+    # Update frequency + recency; the flush also promotes long-term hits that score high enough
+    memory_hits.record([doc.metadata.get("embedding_id") for doc, _, _ in best])
+
+    tiers = {tier for _, _, tier in best}
+    return {
+        "context": "\n---\n".join([doc.page_content for doc, _, _ in best]),
+        "entries": [doc.page_content for doc, _, _ in best],
+        "tier": tiers.pop() if len(tiers) == 1 else "mixed"
+    }
 
 
 # ==================== WRITING ====================
 
-def store_memory(summary: str, user_id: str, conn, embedding_id: str):
-    """Store a new memory in short-term by default"""
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO memories (user_id, content, embedding_id, tier, frequency, last_accessed)
-        VALUES (?, ?, ?, 'short', 1, ?)
-    """, (user_id, summary, embedding_id, datetime.now(timezone.utc)))
-    conn.commit()
+def get_memory_content(embedding_id: str):
+    """The stored text of a memory, or None if there is none with this id"""
+    with memory_db.connection() as conn:
+        row = conn.execute("SELECT content FROM memories WHERE embedding_id = ?", (embedding_id,)).fetchone()
+    return row[0] if row else None
+
+
+def store_memory(summary: str, user_id: str, embedding_id: str):
+    """
+    Store a new memory in short-term by default.
+    Idempotent per embedding_id: storing it again (a retried job) keeps the
+    first text and just makes sure the vector is in Chroma.
+    """
+    with memory_db.connection() as conn:
+        conn.execute("""
+            INSERT OR IGNORE INTO memories (user_id, content, embedding_id, tier, location, frequency, last_accessed)
+            VALUES (?, ?, ?, 'short', 'short', 1, ?)
+        """, (user_id, summary, embedding_id, datetime.now(timezone.utc)))
+        summary = conn.execute("SELECT content FROM memories WHERE embedding_id = ?", (embedding_id,)).fetchone()[0]
+        conn.commit()
 
     # Write to ChromaDB short-term
     doc = Document(
@@ -114,67 +304,290 @@ def store_memory(summary: str, user_id: str, conn, embedding_id: str):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
     )
-    Chroma.from_documents(
-        documents=[doc],
-        embedding=embedding_model,
-        persist_directory=SHORT_TERM_DIR
-    )
+    memory_store.add([doc], SHORT_TERM_DIR, ids=[embedding_id])
+    memory_index.invalidate(user_id)
     print(f"[Memory] Stored new short-term memory for user {user_id}")
 
 
 # ==================== SCORING UPDATES ====================
 
-def bump_memory_score(embedding_id: str, conn):
-    """Increment frequency and update last_accessed when a memory is hit"""
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE memories
-        SET frequency = frequency + 1,
-            last_accessed = ?
-        WHERE embedding_id = ?
-    """, (datetime.now(timezone.utc), embedding_id))
-    conn.commit()
-
-
-def maybe_promote(embedding_id: str, conn):
-    """Move a long-term memory back to short-term if it's being accessed again"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT frequency, last_accessed FROM memories WHERE embedding_id = ?", (embedding_id,))
-    row = cursor.fetchone()
-    if not row:
-        return
-
-    frequency, last_accessed = row
-    if isinstance(last_accessed, str):
-        last_accessed = datetime.fromisoformat(last_accessed)
-
-    score = compute_score(frequency, last_accessed)
-    if score > SHORT_TERM_THRESHOLD:
-        cursor.execute("UPDATE memories SET tier = 'short' WHERE embedding_id = ?", (embedding_id,))
+BUMP_HITS_QUERY = """
+    UPDATE memories
+    SET frequency = frequency + ?,
+        last_accessed = ?
+    WHERE embedding_id = ?
+"""
+
+# compute_score() in SQL: frequency / (whole days since last access + 1)
+SCORE_SQL = "frequency * 1.0 / (CAST(julianday('now') - julianday(last_accessed) AS INTEGER) + 1)"
+
+PROMOTE_HITS_QUERY = f"""
+    UPDATE memories SET tier = 'short'
+    WHERE embedding_id = ?
+      AND tier = 'long'
+      AND {SCORE_SQL} > ?
+"""
+
+
+class MemoryHitBuffer:
+    """
+    Collects memory access hits in process and writes them in one SQLite
+    transaction: an executemany that bumps frequency / last_accessed, then an
+    executemany that promotes long-term hits whose score clears
+    SHORT_TERM_THRESHOLD. Flushed every MEMORY_FLUSH_SECONDS, or as soon as
+    MEMORY_FLUSH_BATCH_SIZE hits are waiting. record() never touches SQLite:
+    a full batch only wakes the background task, which flushes on the executor.
+    """
+
+    def __init__(self, flush_seconds: float = MEMORY_FLUSH_SECONDS, batch_size: int = MEMORY_FLUSH_BATCH_SIZE):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self._pending = []               # (embedding_id, accessed_at)
+        self._lock = threading.Lock()
+        self._task = None
+        self._wakeup = None
+        self._loop = None
+
+    def record(self, embedding_ids: list):
+        """Buffer hits; safe from the event loop or any thread"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._pending.extend((embedding_id, now) for embedding_id in embedding_ids if embedding_id)
+            full = len(self._pending) >= self.batch_size
+        if full and self._wakeup:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def flush(self) -> int:
+        """Write everything buffered so far. Returns the number of memories touched."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        hits = defaultdict(lambda: [0, None])   # embedding_id -> [count, latest access]
+        for embedding_id, accessed_at in pending:
+            hit = hits[embedding_id]
+            hit[0] += 1
+            hit[1] = accessed_at if hit[1] is None else max(hit[1], accessed_at)
+
+        try:
+            with memory_db.connection() as conn:
+                try:
+                    conn.executemany(BUMP_HITS_QUERY, [
+                        (count, accessed_at, embedding_id) for embedding_id, (count, accessed_at) in hits.items()
+                    ])
+                    promoted = conn.executemany(PROMOTE_HITS_QUERY, [
+                        (embedding_id, SHORT_TERM_THRESHOLD) for embedding_id in hits
+                    ]).rowcount
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        except Exception as e:
+            with self._lock:
+                self._pending[:0] = pending
+            metrics.increment("memory.hit_flush_failures")
+            print(f"[Memory] Flushing {len(pending)} hit(s) failed, will retry: {e}")
+            return 0
+
+        metrics.increment("memory.hit_flushes")
+        metrics.observe("memory.hit_flush_size", len(hits))
+        if promoted:
+            print(f"[Memory] Promoted {promoted} memories back to short-term")
+            memory_demotion.request_move()
+        return len(hits)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            # Cleared before flushing so a batch filling up during the flush still wakes us
+            self._wakeup.clear()
+            await run_blocking(self.flush)
+
+    def start(self):
+        """Spawn the periodic flush on the running event loop (call from app startup)"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the periodic flush and write out whatever is still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._wakeup = None
+        await run_blocking(self.flush)
+
+
+memory_hits = MemoryHitBuffer()
+
+
+# ==================== DEMOTION ====================
+
+DEMOTE_STALE_QUERY = f"""
+    UPDATE memories SET tier = 'long'
+    WHERE tier = 'short'
+      AND {SCORE_SQL} < ?
+"""
+
+
+def demote_stale_memories() -> int:
+    """
+    Demote short-term memories whose score has dropped below
+    SHORT_TERM_THRESHOLD, in one UPDATE. Returns how many were demoted.
+    """
+    with memory_db.connection() as conn:
+        demoted = conn.execute(DEMOTE_STALE_QUERY, (SHORT_TERM_THRESHOLD,)).rowcount
         conn.commit()
-        print(f"[Memory] Promoted {embedding_id} back to short-term (score={score:.3f})")
+    metrics.increment("memory.demoted", demoted)
+    print(f"[Memory] Demoted {demoted} memories to long-term")
+    return demoted
+
+
+# ==================== VECTOR MOVES ====================
+
+PENDING_MOVES_QUERY = """
+    SELECT embedding_id, location, tier FROM memories
+    WHERE tier != location
+    LIMIT ?
+"""
 
+# Only if the tier didn't flip again while the vectors were being copied
+MARK_MOVED_QUERY = "UPDATE memories SET location = ? WHERE embedding_id = ? AND tier = ?"
 
-# ==================== DEMOTION JOB ====================
+_move_lock = threading.Lock()
 
-def demote_stale_memories(conn):
+
+def _move_batch(source: str, target: str, embedding_ids: list) -> int:
     """
-    Run periodically — demote short-term memories that haven't been
-    accessed recently and have low scores down to long-term.
+    Copy one batch of vectors from the source tier to the target, then delete
+    them from the source. Every step is idempotent, so a crash anywhere
+    leaves rows that the next pass finishes:
+      - crash after the upsert: the vectors are in both tiers; copied again, then deleted
+      - crash after the delete: the vectors are only in the target; just marked moved
     """
-    cursor = conn.cursor()
-    cursor.execute("SELECT embedding_id, frequency, last_accessed FROM memories WHERE tier = 'short'")
-    rows = cursor.fetchall()
+    found = memory_store.get_vectors(TIER_DIRS[source], embedding_ids)
+    metadatas = [dict(metadata or {}, tier=target) for metadata in found["metadatas"]]
+    if found["ids"]:
+        memory_store.upsert_vectors(
+            TIER_DIRS[target],
+            # stable ids make the copy repeatable
+            [metadata.get("embedding_id") or doc_id for doc_id, metadata in zip(found["ids"], metadatas)],
+            found["embeddings"],
+            found["documents"],
+            metadatas,
+        )
+        memory_store.delete_vectors(TIER_DIRS[source], embedding_ids)
+        for user_id in {metadata.get("user_id") for metadata in metadatas}:
+            memory_index.invalidate(user_id)
+
+    copied = {metadata.get("embedding_id") for metadata in metadatas}
+    missing = [embedding_id for embedding_id in embedding_ids if embedding_id not in copied]
+    if missing:
+        in_target = {
+            (metadata or {}).get("embedding_id")
+            for metadata in memory_store.get_vectors(TIER_DIRS[target], missing)["metadatas"]
+        }
+        lost = [embedding_id for embedding_id in missing if embedding_id not in in_target]
+        if lost:
+            # Nothing left to move; record the row as settled rather than retrying forever
+            metrics.increment("memory.move_missing", len(lost))
+            print(f"[Memory] {len(lost)} memories had no vector in either tier")
+
+    with memory_db.connection() as conn:
+        moved = conn.executemany(MARK_MOVED_QUERY, [
+            (target, embedding_id, target) for embedding_id in embedding_ids
+        ]).rowcount
+        conn.commit()
+    return moved
 
-    demoted = 0
-    for embedding_id, frequency, last_accessed in rows:
-        if isinstance(last_accessed, str):
-            last_accessed = datetime.fromisoformat(last_accessed)
-        score = compute_score(frequency, last_accessed)
-        if score < SHORT_TERM_THRESHOLD:
-            cursor.execute("UPDATE memories SET tier = 'long' WHERE embedding_id = ?", (embedding_id,))
-            demoted += 1
 
-    conn.commit()
-    print(f"[Memory] Demoted {demoted} memories to long-term")
-    init_memory_db()
+def move_tier_vectors(batch_size: int = MEMORY_MOVE_BATCH_SIZE) -> int:
+    """
+    Bring the Chroma collections in line with the tier column: move every
+    memory whose location differs from its tier, a batch at a time.
+    Returns how many were moved.
+    """
+    if not _move_lock.acquire(blocking=False):
+        return 0   # another thread is already moving
+    try:
+        moved = 0
+        while True:
+            with memory_db.connection() as conn:
+                rows = conn.execute(PENDING_MOVES_QUERY, (batch_size,)).fetchall()
+            if not rows:
+                break
+
+            batches = defaultdict(list)   # (source, target) -> embedding_ids
+            for embedding_id, location, tier in rows:
+                batches[(location, tier)].append(embedding_id)
+            batch_moved = 0
+            for (source, target), embedding_ids in batches.items():
+                batch_moved += _move_batch(source, target, embedding_ids)
+            moved += batch_moved
+            if not batch_moved:
+                break   # rows keep flipping tier under us; leave them for the next pass
+        if moved:
+            metrics.increment("memory.moved", moved)
+            print(f"[Memory] Moved {moved} memories between tiers")
+        return moved
+    finally:
+        _move_lock.release()
+
+
+class DemotionScheduler:
+    """
+    Every MEMORY_DEMOTE_INTERVAL_SECONDS, off the chat path: demote stale
+    memories, then move vectors to match (also picking up any moves a crash
+    or failed flush left behind). request_move() runs just the move step
+    early, e.g. after a hit flush promoted memories.
+    """
+
+    def __init__(self, interval_seconds: float = MEMORY_DEMOTE_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._task = None
+        self._move_requested = None
+        self._loop = None
+
+    def request_move(self):
+        """Safe from any thread; a no-op until start()"""
+        if self._move_requested:
+            self._loop.call_soon_threadsafe(self._move_requested.set)
+
+    async def _run(self):
+        next_demotion = 0.0
+        while True:
+            self._move_requested.clear()
+            try:
+                if self._loop.time() >= next_demotion:
+                    next_demotion = self._loop.time() + self.interval_seconds
+                    await run_blocking(demote_stale_memories)
+                await run_blocking(move_tier_vectors)
+            except Exception as e:
+                print(f"[Memory] Demotion pass failed: {e}")
+            try:
+                await asyncio.wait_for(
+                    self._move_requested.wait(), timeout=max(0.0, next_demotion - self._loop.time())
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Spawn the scheduler on the running event loop (call from app startup)"""
+        self._loop = asyncio.get_running_loop()
+        self._move_requested = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._move_requested = None
+
+
+memory_demotion = DemotionScheduler()
@@ -0,0 +1,223 @@
+"""
+Schema migrations for Postgres and the local SQLite memory DB.
+
+Migrations are numbered .sql files under storage/migrations/<engine>/ and are
+applied in order, each in its own transaction, recording their version in a
+schema_migrations table. Apply pending ones from the backend directory:
+
+    python -m storage.migrate            # apply everything pending
+    python -m storage.migrate status     # show current / latest versions
+
+App startup only calls check(), one version query per database.
+"""
+import argparse
+import os
+import re
+import sqlite3
+
+import psycopg2.errors
+
+from storage.postgres_pool import pg_pool
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+SQLITE_DB_PATH = "db/memory.db"
+
+# Let startup apply pending Postgres migrations instead of refusing to start
+# (fine for a single instance; multi-worker deploys should run the CLI)
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() == "true"
+
+# Serialises concurrent runners against the same Postgres database
+PG_MIGRATION_LOCK_ID = 727_001
+
+PG_SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     INTEGER PRIMARY KEY,
+        name        TEXT NOT NULL,
+        applied_at  TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SQLITE_SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     INTEGER PRIMARY KEY,
+        name        TEXT NOT NULL,
+        applied_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def list_migrations(engine: str) -> list:
+    """[(version, name, sql)] for storage/migrations/<engine>, in version order"""
+    directory = os.path.join(MIGRATIONS_DIR, engine)
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = re.match(r"^(\d+)_(.+)\.sql$", filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            migrations.append((int(match.group(1)), match.group(2), f.read()))
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def latest_version(engine: str) -> int:
+    migrations = list_migrations(engine)
+    return migrations[-1][0] if migrations else 0
+
+
+# ==================== POSTGRES ====================
+
+def postgres_version() -> int:
+    with pg_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations")
+        except psycopg2.errors.UndefinedTable:
+            return 0
+        return cursor.fetchone()["version"]
+
+
+def migrate_postgres() -> list:
+    """Apply pending Postgres migrations. Returns the versions applied."""
+    applied = []
+    with pg_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (PG_MIGRATION_LOCK_ID,))
+        cursor.execute(PG_SCHEMA_MIGRATIONS_TABLE)
+        conn.commit()
+
+        for version, name, sql in list_migrations("postgres"):
+            try:
+                # Held until commit, so a second runner waits and then skips
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (PG_MIGRATION_LOCK_ID,))
+                cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cursor.fetchone():
+                    conn.rollback()
+                    continue
+                print(f"[Migrate] postgres {version:04d}_{name}")
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                conn.commit()
+                applied.append(version)
+            except Exception:
+                conn.rollback()
+                raise
+    return applied
+
+
+# ==================== SQLITE ====================
+
+def _sqlite_connect(db_path: str):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    return sqlite3.connect(db_path, timeout=10)
+
+
+def sqlite_version(db_path: str = SQLITE_DB_PATH) -> int:
+    conn = _sqlite_connect(db_path)
+    try:
+        present = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'"
+        ).fetchone()
+        if not present:
+            return 0
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _split_sqlite_statements(sql: str) -> list:
+    """executescript() would commit our transaction, so run the file statement by statement"""
+    statements, current = [], ""
+    for line in sql.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current)
+            current = ""
+    leftover = "\n".join(line for line in current.splitlines() if not line.strip().startswith("--"))
+    if leftover.strip():
+        raise ValueError(f"Incomplete SQL statement at end of migration: {current.strip()[:80]}")
+    return statements
+
+
+def migrate_sqlite(db_path: str = SQLITE_DB_PATH) -> list:
+    """Apply pending SQLite migrations. Returns the versions applied."""
+    applied = []
+    conn = _sqlite_connect(db_path)
+    conn.isolation_level = None   # explicit BEGIN / COMMIT below
+    try:
+        conn.execute(SQLITE_SCHEMA_MIGRATIONS_TABLE)
+        for version, name, sql in list_migrations("sqlite"):
+            # IMMEDIATE takes the write lock, so a second worker waits and then skips
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,)).fetchone():
+                    conn.execute("ROLLBACK")
+                    continue
+                print(f"[Migrate] sqlite {version:04d}_{name}")
+                for statement in _split_sqlite_statements(sql):
+                    conn.execute(statement)
+                conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (version, name))
+                conn.execute("COMMIT")
+                applied.append(version)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
+    return applied
+
+
+# ==================== STARTUP CHECK ====================
+
+def check():
+    """
+    Called from app startup: one version query per database.
+    The SQLite file is local to this instance, so it is brought up to date
+    here. A stale Postgres schema is migrated only when AUTO_MIGRATE is set;
+    otherwise startup fails with instructions.
+    """
+    if sqlite_version() < latest_version("sqlite"):
+        migrate_sqlite()
+
+    have, want = postgres_version(), latest_version("postgres")
+    if have >= want:
+        return
+    if AUTO_MIGRATE:
+        migrate_postgres()
+        return
+    raise SchemaOutOfDate(
+        f"Postgres schema is at version {have}, code expects {want}. "
+        "Run `python -m storage.migrate` from the backend directory (or set AUTO_MIGRATE=true)."
+    )
+
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("command", nargs="?", default="up", choices=["up", "status"])
+    parser.add_argument("--sqlite-db", default=SQLITE_DB_PATH)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(f"postgres: {postgres_version()} / {latest_version('postgres')}")
+        print(f"sqlite:   {sqlite_version(args.sqlite_db)} / {latest_version('sqlite')}")
+        return
+
+    applied_pg = migrate_postgres()
+    applied_sqlite = migrate_sqlite(args.sqlite_db)
+    print(f"[Migrate] Applied {len(applied_pg)} postgres and {len(applied_sqlite)} sqlite migration(s)")
+
+
+if __name__ == "__main__":
+    main()
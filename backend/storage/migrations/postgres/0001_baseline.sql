@@ -0,0 +1,78 @@
+-- Baseline: the schema the repositories created at import time before
+-- migrations existed. Everything is IF NOT EXISTS so it applies cleanly
+-- to databases that already have these tables.
+
+CREATE TABLE IF NOT EXISTS users (
+    id          BIGSERIAL PRIMARY KEY,
+    google_id   VARCHAR(255) UNIQUE,
+    email       VARCHAR(255) UNIQUE NOT NULL,
+    display_name VARCHAR(255) NOT NULL,
+    given_name  VARCHAR(255) NOT NULL,
+    family_name VARCHAR(255) NOT NULL,
+    title       VARCHAR(255),
+    location    VARCHAR(255),
+    system_prompt TEXT,
+    picture_url TEXT,
+    tasks_number  INT DEFAULT 0,
+    chats_number  INT DEFAULT 0,
+    pdfs_number   INT DEFAULT 0,
+    verified    BOOLEAN DEFAULT FALSE,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_tokens (
+    user_id       VARCHAR(255) PRIMARY KEY,
+    access_token  TEXT NOT NULL,
+    refresh_token TEXT,
+    expires_in    INT,
+    scope         TEXT,
+    token_type    VARCHAR(50),
+    id_token      TEXT,
+    profile_json  JSONB,
+    created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Absolute expiry for the token refresher
+ALTER TABLE user_tokens ADD COLUMN IF NOT EXISTS expires_at TIMESTAMPTZ;
+ALTER TABLE user_tokens ADD COLUMN IF NOT EXISTS login_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP;
+UPDATE user_tokens
+SET expires_at = updated_at + expires_in * INTERVAL '1 second'
+WHERE expires_at IS NULL AND expires_in IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_user_tokens_expires_at
+    ON user_tokens (expires_at) WHERE refresh_token IS NOT NULL;
+
+-- Google Calendar / Tasks mirror
+CREATE TABLE IF NOT EXISTS google_sync_state (
+    user_id     VARCHAR(255) NOT NULL,
+    resource    VARCHAR(50)  NOT NULL,
+    sync_token  TEXT,
+    synced_at   TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, resource)
+);
+
+CREATE TABLE IF NOT EXISTS calendar_events (
+    user_id     VARCHAR(255) NOT NULL,
+    event_id    VARCHAR(1024) NOT NULL,
+    start_time  TIMESTAMPTZ,
+    end_time    TIMESTAMPTZ,
+    event_json  JSONB NOT NULL,
+    updated_at  TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS idx_calendar_events_user_end
+    ON calendar_events (user_id, end_time);
+
+CREATE TABLE IF NOT EXISTS google_tasks (
+    user_id     VARCHAR(255) NOT NULL,
+    task_id     VARCHAR(1024) NOT NULL,
+    list_id     VARCHAR(1024) NOT NULL,
+    list_index  INT DEFAULT 0,
+    list_title  TEXT,
+    position    TEXT,
+    task_json   JSONB NOT NULL,
+    updated_at  TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, task_id)
+);
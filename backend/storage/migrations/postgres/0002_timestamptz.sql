@@ -0,0 +1,11 @@
+-- users and user_tokens were created with TIMESTAMP while every newer table
+-- (and the old schema.sql) uses TIMESTAMPTZ. Existing values were written
+-- with CURRENT_TIMESTAMP in the server's UTC session, so read them as UTC.
+
+ALTER TABLE users
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC';
+
+ALTER TABLE user_tokens
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC';
@@ -0,0 +1,5 @@
+-- End of the time window the last full calendar sync covered. Events that
+-- start later only reach the mirror through the next full sync, which runs
+-- before the window gets close (google_sync.CALENDAR_RESYNC_HORIZON_DAYS).
+
+ALTER TABLE google_sync_state ADD COLUMN IF NOT EXISTS window_end TIMESTAMPTZ;
@@ -0,0 +1,6 @@
+-- Token refresher state shared by every worker: a claimed row is leased to one
+-- scheduler until refresh_locked_until, and a failed refresh isn't picked up
+-- again before refresh_next_attempt_at.
+
+ALTER TABLE user_tokens ADD COLUMN IF NOT EXISTS refresh_locked_until TIMESTAMPTZ;
+ALTER TABLE user_tokens ADD COLUMN IF NOT EXISTS refresh_next_attempt_at TIMESTAMPTZ;
@@ -0,0 +1,12 @@
+-- Memory metadata in db/memory.db (was storage/database.py:init_memory_db)
+
+CREATE TABLE IF NOT EXISTS memories (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id       TEXT NOT NULL,
+    content       TEXT NOT NULL,
+    embedding_id  TEXT NOT NULL,
+    tier          TEXT DEFAULT 'short',
+    frequency     INTEGER DEFAULT 1,
+    last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
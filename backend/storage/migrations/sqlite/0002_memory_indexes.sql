@@ -0,0 +1,5 @@
+-- Hit bumps / promotion look memories up by embedding_id; per-user reads filter on tier
+
+CREATE INDEX IF NOT EXISTS idx_memories_embedding_id ON memories (embedding_id);
+
+CREATE INDEX IF NOT EXISTS idx_memories_user_tier ON memories (user_id, tier);
@@ -0,0 +1,8 @@
+-- location = the Chroma tier that currently holds the vector; tier = where it should be.
+-- Every vector written so far went to the short-term collection.
+
+ALTER TABLE memories ADD COLUMN location TEXT;
+
+UPDATE memories SET location = 'short';
+
+CREATE INDEX IF NOT EXISTS idx_memories_pending_move ON memories (id) WHERE tier != location;
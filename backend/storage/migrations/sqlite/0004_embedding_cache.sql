@@ -0,0 +1,10 @@
+-- Disk tier of embedding_cache.py: one vector per (model, dimensions, sha256 of the text)
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model       TEXT NOT NULL,
+    dimensions  INTEGER NOT NULL,
+    text_hash   TEXT NOT NULL,
+    vector      BLOB NOT NULL,
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (model, dimensions, text_hash)
+) WITHOUT ROWID;
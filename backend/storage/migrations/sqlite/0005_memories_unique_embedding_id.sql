@@ -0,0 +1,5 @@
+-- One memories row per embedding_id, so a retried summarization job can't store its memory twice
+
+DROP INDEX IF EXISTS idx_memories_embedding_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_memories_embedding_id ON memories (embedding_id);
@@ -0,0 +1,7 @@
+-- Per-user content version for answer_cache.py, shared by every worker on the
+-- instance: uploads and new memories bump it, which retires cached replies everywhere
+
+CREATE TABLE IF NOT EXISTS answer_cache_versions (
+    user_id  TEXT PRIMARY KEY,
+    version  INTEGER NOT NULL
+) WITHOUT ROWID;
@@ -0,0 +1,7 @@
+-- Lets embedding_cache.py cap the table by evicting the least recently used vectors
+
+ALTER TABLE embedding_cache ADD COLUMN last_used_at TIMESTAMP;
+
+UPDATE embedding_cache SET last_used_at = created_at;
+
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used_at);
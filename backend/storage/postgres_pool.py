@@ -0,0 +1,188 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from dotenv import load_dotenv
+
+import metrics
+
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(backend_dir, '.env'))
+
+PG_POOL_MIN_SIZE        = int(os.getenv("PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE        = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+PG_POOL_ACQUIRE_TIMEOUT = float(os.getenv("PG_POOL_ACQUIRE_TIMEOUT", "5"))
+# Connections idle longer than this are pinged before being handed out
+# (Neon and most proxies drop idle connections after a few minutes)
+PG_POOL_HEALTHCHECK_IDLE_SECONDS = float(os.getenv("PG_POOL_HEALTHCHECK_IDLE_SECONDS", "30"))
+PG_CONNECT_TIMEOUT      = int(os.getenv("PG_CONNECT_TIMEOUT", "10"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PostgresPool:
+    """
+    Thread-safe psycopg2 connection pool shared by the repositories.
+    At most max_size connections are open; callers wait up to acquire_timeout
+    for one to free up. Connections that sat idle are health-checked before
+    reuse, and anything left uncommitted is rolled back on release.
+    """
+
+    def __init__(self, min_size: int = PG_POOL_MIN_SIZE, max_size: int = PG_POOL_MAX_SIZE,
+                 acquire_timeout: float = PG_POOL_ACQUIRE_TIMEOUT):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = deque()   # (conn, released_at)
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+
+    # ==================== LIFECYCLE ====================
+
+    def _connect(self):
+        db_url = os.getenv("DATABASE_URL")
+        if not db_url:
+            raise RuntimeError("DATABASE_URL not set — check your .env file")
+        conn = psycopg2.connect(
+            db_url,
+            cursor_factory=psycopg2.extras.RealDictCursor,
+            connect_timeout=PG_CONNECT_TIMEOUT,
+        )
+        metrics.increment("pg_pool.connects")
+        return conn
+
+    def open(self):
+        """Pre-open min_size connections (call from app startup)"""
+        with self._lock:
+            self._closed = False
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        print(f"[PgPool] Opened (min={self.min_size}, max={self.max_size})")
+
+    def close(self):
+        """Close idle connections; ones still checked out are closed on release"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._discard(conn, counted=False)
+
+    # ==================== ACQUIRE / RELEASE ====================
+
+    def _healthy(self, conn, released_at: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - released_at < PG_POOL_HEALTHCHECK_IDLE_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            metrics.increment("pg_pool.health_check_failures")
+            return False
+
+    def _discard(self, conn, counted: bool = True):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        if counted:
+            with self._lock:
+                self._size -= 1
+
+    def acquire(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            metrics.increment("pg_pool.timeouts")
+            raise PoolTimeout(f"No Postgres connection free within {self.acquire_timeout}s")
+        metrics.observe("pg_pool.wait_seconds", time.monotonic() - started)
+
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                    if entry is None:
+                        self._size += 1
+                if entry is None:
+                    try:
+                        conn = self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._size -= 1
+                        raise
+                    break
+                conn, released_at = entry
+                if self._healthy(conn, released_at):
+                    break
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        metrics.increment("pg_pool.acquired")
+        return conn
+
+    def release(self, conn):
+        try:
+            if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            pass
+
+        with self._lock:
+            self._in_use -= 1
+        if conn.closed or self._closed:
+            self._discard(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """with pg_pool.connection() as conn: ... — the connection goes back to the pool on exit"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    # ==================== INSPECTION ====================
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
+
+
+pg_pool = PostgresPool()
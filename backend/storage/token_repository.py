@@ -1,95 +1,126 @@
 import os
-import psycopg2
-import psycopg2.extras
 from dotenv import load_dotenv
 
+from storage.postgres_pool import pg_pool
+from storage.identity_cache import identity_cache
+
 
 backend_dir = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(backend_dir, '.env'))
 
 
 def get_connection():
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
-        raise RuntimeError("DATABASE_URL not set — check your .env file")
-    return psycopg2.connect(db_url, cursor_factory=psycopg2.extras.RealDictCursor)
-
-
-# ==================== TABLE SETUP ====================
-def create_table():
-    conn = get_connection()
-    cursor = conn.cursor()
-    query = """
-        CREATE TABLE IF NOT EXISTS user_tokens (
-            user_id       VARCHAR(255) PRIMARY KEY,
-            access_token  TEXT NOT NULL,
-            refresh_token TEXT,
-            expires_in    INT,
-            scope         TEXT,
-            token_type    VARCHAR(50),
-            id_token      TEXT,
-            profile_json  JSONB,
-            created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """
-    cursor.execute(query)
-    conn.commit()
-    conn.close()
-
+    """Borrow a pooled connection: with get_connection() as conn: ..."""
+    return pg_pool.connection()
+
+
+# ==================== QUERIES ====================
+# Shared with async_token_repository, which runs the same SQL on psycopg 3
+
+SAVE_TOKENS_QUERY = """
+    INSERT INTO user_tokens (
+        user_id, access_token, refresh_token, expires_in, expires_at,
+        scope, token_type, id_token, profile_json, login_at, updated_at
+    ) VALUES (
+        %s, %s, %s, %s, CURRENT_TIMESTAMP + %s::INT * INTERVAL '1 second',
+        %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    )
+    ON CONFLICT (user_id) DO UPDATE SET
+        access_token  = EXCLUDED.access_token,
+        refresh_token = COALESCE(EXCLUDED.refresh_token, user_tokens.refresh_token),
+        expires_in    = EXCLUDED.expires_in,
+        expires_at    = EXCLUDED.expires_at,
+        login_at      = CURRENT_TIMESTAMP,
+        scope         = EXCLUDED.scope,
+        token_type    = EXCLUDED.token_type,
+        id_token      = EXCLUDED.id_token,
+        profile_json  = EXCLUDED.profile_json,
+        refresh_next_attempt_at = NULL,
+        updated_at    = CURRENT_TIMESTAMP
+"""
+
+GET_TOKENS_QUERY = "SELECT * FROM user_tokens WHERE user_id = %s"
+
+UPDATE_REFRESHED_TOKENS_QUERY = """
+    UPDATE user_tokens SET
+        access_token  = %s,
+        refresh_token = COALESCE(%s, refresh_token),
+        expires_in    = %s,
+        expires_at    = CURRENT_TIMESTAMP + %s::INT * INTERVAL '1 second',
+        scope         = COALESCE(%s, scope),
+        token_type    = COALESCE(%s, token_type),
+        id_token      = COALESCE(%s, id_token),
+        refresh_locked_until    = NULL,
+        refresh_next_attempt_at = NULL,
+        updated_at    = CURRENT_TIMESTAMP
+    WHERE user_id = %s
+"""
+
+CLEAR_REFRESH_TOKEN_QUERY = """
+    UPDATE user_tokens SET refresh_token = NULL, refresh_locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+    WHERE user_id = %s
+"""
+
+RECORD_REFRESH_FAILURE_QUERY = """
+    UPDATE user_tokens SET
+        refresh_locked_until    = NULL,
+        refresh_next_attempt_at = CURRENT_TIMESTAMP + %s::INT * INTERVAL '1 second'
+    WHERE user_id = %s
+"""
+
+# Leases the batch to the caller: rows another worker holds are skipped, not waited on
+CLAIM_EXPIRING_TOKENS_QUERY = """
+    UPDATE user_tokens SET refresh_locked_until = CURRENT_TIMESTAMP + %s::INT * INTERVAL '1 second'
+    WHERE user_id IN (
+        SELECT user_id FROM user_tokens
+        WHERE refresh_token IS NOT NULL
+          AND expires_at < CURRENT_TIMESTAMP + %s::INT * INTERVAL '1 second'
+          AND login_at > CURRENT_TIMESTAMP - %s::INT * INTERVAL '1 second'
+          AND (refresh_next_attempt_at IS NULL OR refresh_next_attempt_at <= CURRENT_TIMESTAMP)
+          AND (refresh_locked_until IS NULL OR refresh_locked_until <= CURRENT_TIMESTAMP)
+        ORDER BY expires_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING user_id, refresh_token, expires_at
+"""
+
+DELETE_TOKENS_QUERY = "DELETE FROM user_tokens WHERE user_id = %s"
+
+
+def save_tokens_params(user_id: str, token_data: dict, profile_json) -> tuple:
+    """profile_json is the profile already adapted for the driver (json string / Jsonb)"""
+    return (
+        user_id,
+        token_data.get("access_token"),
+        token_data.get("refresh_token"),
+        token_data.get("expires_in"),
+        token_data.get("expires_in"),
+        token_data.get("scope"),
+        token_data.get("token_type"),
+        token_data.get("id_token"),
+        profile_json,
+    )
 
-# ==================== CREATE / UPSERT ====================
-def save_tokens(user_id: str, token_data: dict, profile: dict):
-    """
-    Store or update the OAuth token bundle + profile for a user.
-    token_data is the raw dict returned by Google's token endpoint.
-    profile is the raw userinfo dict.
-    """
-    import json
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    query = """
-        INSERT INTO user_tokens (
-            user_id, access_token, refresh_token, expires_in,
-            scope, token_type, id_token, profile_json, updated_at
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-        ON CONFLICT (user_id) DO UPDATE SET
-            access_token  = EXCLUDED.access_token,
-            refresh_token = COALESCE(EXCLUDED.refresh_token, user_tokens.refresh_token),
-            expires_in    = EXCLUDED.expires_in,
-            scope         = EXCLUDED.scope,
-            token_type    = EXCLUDED.token_type,
-            id_token      = EXCLUDED.id_token,
-            profile_json  = EXCLUDED.profile_json,
-            updated_at    = CURRENT_TIMESTAMP
-    """
-    cursor.execute(query, (
-        user_id,
+def refreshed_tokens_params(user_id: str, token_data: dict) -> tuple:
+    return (
         token_data.get("access_token"),
         token_data.get("refresh_token"),
         token_data.get("expires_in"),
+        token_data.get("expires_in"),
         token_data.get("scope"),
         token_data.get("token_type"),
         token_data.get("id_token"),
-        json.dumps(profile),
-    ))
-    conn.commit()
-    conn.close()
+        user_id,
+    )
 
 
-# ==================== READ ====================
-def get_tokens(user_id: str):
+def tokens_from_row(row):
     """
     Returns a dict shaped like the old in-memory user_tokens[user_id]:
     { "tokens": {...}, "profile": {...} }  or None if not found.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM user_tokens WHERE user_id = %s", (user_id,))
-    row = cursor.fetchone()
-    conn.close()
-
     if not row:
         return None
 
@@ -98,6 +129,7 @@ def get_tokens(user_id: str):
             "access_token": row["access_token"],
             "refresh_token": row["refresh_token"],
             "expires_in": row["expires_in"],
+            "expires_at": row["expires_at"],
             "scope": row["scope"],
             "token_type": row["token_type"],
             "id_token": row["id_token"],
@@ -106,16 +138,81 @@ def get_tokens(user_id: str):
     }
 
 
-# ==================== DELETE ====================
-def delete_tokens(user_id: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM user_tokens WHERE user_id = %s", (user_id,))
-    conn.commit()
-    conn.close()
+# ==================== CREATE / UPSERT ====================
+def save_tokens(user_id: str, token_data: dict, profile: dict):
+    """
+    Store or update the OAuth token bundle + profile for a user.
+    token_data is the raw dict returned by Google's token endpoint.
+    profile is the raw userinfo dict.
+    """
+    import json
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SAVE_TOKENS_QUERY, save_tokens_params(user_id, token_data, json.dumps(profile)))
+        conn.commit()
+    identity_cache.invalidate(user_id)
 
 
-# ==================== INITIALIZE ====================
-if __name__ == "__main__":
-    create_table()
-    print("user_tokens table created successfully!")
\ No newline at end of file
+# ==================== READ ====================
+def get_tokens(user_id: str):
+    """See tokens_from_row() for the shape"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(GET_TOKENS_QUERY, (user_id,))
+        row = cursor.fetchone()
+    return tokens_from_row(row)
+
+
+# ==================== REFRESH ====================
+def update_refreshed_tokens(user_id: str, token_data: dict):
+    """
+    Store the result of a refresh_token grant. Google usually omits
+    refresh_token and id_token here, so the stored ones are kept.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(UPDATE_REFRESHED_TOKENS_QUERY, refreshed_tokens_params(user_id, token_data))
+        conn.commit()
+    identity_cache.invalidate(user_id)
+
+
+def clear_refresh_token(user_id: str):
+    """Google rejected the refresh token (revoked / expired) — stop trying to use it"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CLEAR_REFRESH_TOKEN_QUERY, (user_id,))
+        conn.commit()
+    identity_cache.invalidate(user_id)
+
+
+def claim_expiring_tokens(within_seconds: int, login_within_seconds: int, limit: int, lease_seconds: int) -> list:
+    """
+    Users whose access token expires in the next within_seconds (or already has),
+    who logged in recently enough to still have a session and whose last failed
+    refresh has cooled down. The rows are leased for lease_seconds so other
+    workers skip them; a refresh result (success or failure) releases the lease.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CLAIM_EXPIRING_TOKENS_QUERY, (lease_seconds, within_seconds, login_within_seconds, limit))
+        rows = cursor.fetchall()
+        conn.commit()
+    return rows
+
+
+def record_refresh_failure(user_id: str, retry_seconds: int):
+    """Release the lease and keep the scheduler off this user for retry_seconds"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(RECORD_REFRESH_FAILURE_QUERY, (retry_seconds, user_id))
+        conn.commit()
+
+
+# ==================== DELETE ====================
+def delete_tokens(user_id: str):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(DELETE_TOKENS_QUERY, (user_id,))
+        conn.commit()
+    identity_cache.invalidate(user_id)
@@ -1,8 +1,10 @@
 import os
-import psycopg2
 import psycopg2.extras
 from dotenv import load_dotenv
 
+from storage.postgres_pool import pg_pool
+from storage.identity_cache import identity_cache
+
 
 backend_dir = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(backend_dir, '.env'))
@@ -10,123 +12,167 @@ print("DATABASE_URL loaded:", bool(os.getenv("DATABASE_URL")))
 
 
 def get_connection():
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
-        raise RuntimeError("DATABASE_URL not set — check your .env file")
-    return psycopg2.connect(db_url, cursor_factory=psycopg2.extras.RealDictCursor)
-
-# ==================== TABLE SETUP ====================
-def create_table():
-    conn = get_connection()
-    cursor = conn.cursor()
-    query = """
-        CREATE TABLE IF NOT EXISTS users (
-            id          BIGSERIAL PRIMARY KEY,
-            google_id   VARCHAR(255) UNIQUE,
-            email       VARCHAR(255) UNIQUE NOT NULL,
-            display_name VARCHAR(255) NOT NULL,
-            given_name  VARCHAR(255) NOT NULL,
-            family_name VARCHAR(255) NOT NULL,
-            title       VARCHAR(255),
-            location    VARCHAR(255),
-            system_prompt TEXT,
-            picture_url TEXT,
-            tasks_number  INT DEFAULT 0,
-            chats_number  INT DEFAULT 0,
-            pdfs_number   INT DEFAULT 0,
-            verified    BOOLEAN DEFAULT FALSE,
-            created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """
-    cursor.execute(query)
-    conn.commit()
-    conn.close()
+    """Borrow a pooled connection: with get_connection() as conn: ..."""
+    return pg_pool.connection()
 
-# ==================== CREATE ====================
-def create_user(user, google_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    query = """
-        INSERT INTO users (
-            google_id, email, display_name, given_name, family_name, picture_url
-        ) VALUES (%s, %s, %s, %s, %s, %s)
-        ON CONFLICT (google_id) DO NOTHING
-    """
-    cursor.execute(query, (
+# ==================== QUERIES ====================
+# Shared with async_user_repository, which runs the same SQL on psycopg 3
+
+CREATE_USER_QUERY = """
+    INSERT INTO users (
+        google_id, email, display_name, given_name, family_name, picture_url
+    ) VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (google_id) DO NOTHING
+"""
+
+GET_USER_BY_GOOGLE_ID_QUERY = "SELECT * FROM users WHERE google_id = %s"
+
+GET_USER_BY_ID_QUERY = "SELECT * FROM users WHERE id = %s"
+
+GET_IDENTITY_QUERY = """
+    SELECT u.*, t.user_id AS token_user_id,
+           t.access_token, t.refresh_token, t.expires_in, t.expires_at,
+           t.scope, t.token_type, t.id_token, t.profile_json
+    FROM (SELECT %s::VARCHAR AS google_id) k
+    LEFT JOIN users u       ON u.google_id = k.google_id
+    LEFT JOIN user_tokens t ON t.user_id = k.google_id
+"""
+
+# Activity counters are only ever changed by add_activity_counts()
+UPDATE_USER_QUERY = """
+    UPDATE users
+    SET display_name  = %s,
+        email          = %s,
+        given_name     = %s,
+        family_name    = %s,
+        title          = %s,
+        location       = %s,
+        system_prompt  = %s,
+        picture_url    = %s,
+        updated_at     = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
+ADD_ACTIVITY_COUNTS_QUERY = """
+    UPDATE users AS u SET
+        chats_number = COALESCE(u.chats_number, 0) + v.chats,
+        pdfs_number  = COALESCE(u.pdfs_number, 0)  + v.pdfs,
+        tasks_number = COALESCE(u.tasks_number, 0) + v.tasks
+    FROM (VALUES %s) AS v (google_id, chats, pdfs, tasks)
+    WHERE u.google_id = v.google_id
+"""
+
+TOKEN_COLUMNS = (
+    "access_token", "refresh_token", "expires_in", "expires_at",
+    "scope", "token_type", "id_token", "profile_json",
+)
+
+
+def create_user_params(user, google_id) -> tuple:
+    return (
         google_id,
         user.email,
         user.display_name,
         user.given_name,
         user.family_name,
         user.picture_url
-    ))
-    conn.commit()
-    conn.close()
+    )
+
+
+def update_user_params(user_id, data) -> tuple:
+    return (
+        data.get("display_name"),
+        data.get("email"),
+        data.get("given_name"),
+        data.get("family_name"),
+        data.get("title"),
+        data.get("location"),
+        data.get("system_prompt"),
+        data.get("picture_url"),
+        user_id
+    )
+
+
+def identity_from_row(row) -> dict:
+    """Split a GET_IDENTITY_QUERY row into the get_identity() shape"""
+    user = {key: value for key, value in row.items() if key not in TOKEN_COLUMNS and key != "token_user_id"}
+    return {
+        "user": user if user["id"] is not None else None,
+        "tokens": {
+            key: row[key] for key in TOKEN_COLUMNS if key != "profile_json"
+        } if row["token_user_id"] is not None else None,
+        "profile": row["profile_json"],
+    }
+
+# ==================== CREATE ====================
+def create_user(user, google_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_USER_QUERY, create_user_params(user, google_id))
+        conn.commit()
+    identity_cache.invalidate(google_id)
 
 # ==================== READ ====================
 def get_user_by_google_id(google_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE google_id = %s", (google_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(GET_USER_BY_GOOGLE_ID_QUERY, (google_id,))
+        return cursor.fetchone()
 
 def get_user_by_id(user_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(GET_USER_BY_ID_QUERY, (user_id,))
+        return cursor.fetchone()
+
+
+def get_identity(google_id):
+    """
+    The user row and their OAuth tokens in one round trip, through the
+    identity cache. Returns {"user": row or None, "tokens": {...} or None,
+    "profile": {...} or None}; "tokens"/"profile" match get_tokens().
+    """
+    hit, identity, version = identity_cache.get(google_id)
+    if hit:
+        return identity
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(GET_IDENTITY_QUERY, (google_id,))
+        identity = identity_from_row(cursor.fetchone())
+    identity_cache.put(google_id, identity, version)
+    return identity
 
 # ==================== UPDATE ====================
 def update_user(user_id, data):
-    conn = get_connection()        
-    cursor = conn.cursor()
-
-    query = """
-        UPDATE users
-        SET display_name  = %s,
-            email          = %s,
-            given_name     = %s,
-            family_name    = %s,
-            title          = %s,
-            location       = %s,
-            system_prompt  = %s,
-            picture_url    = %s,
-            tasks_number   = %s,
-            chats_number   = %s,
-            pdfs_number    = %s,
-            updated_at     = CURRENT_TIMESTAMP
-        WHERE id = %s
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(UPDATE_USER_QUERY, update_user_params(user_id, data))
+            print(f"[UserRepository] Updated user {user_id} with data: {data}")
+            conn.commit()
+        except Exception as e:
+            print(f"[UserRepository] Error updating user {user_id}: {e}")
+            conn.rollback()
+            raise
+    identity_cache.invalidate_user_id(user_id)
+
+
+def add_activity_counts(deltas: list):
+    """
+    Apply buffered counter increments in one statement.
+    deltas are (google_id, chats, pdfs, tasks) tuples, one per user.
     """
-    try: 
-        cursor.execute(query, (
-            data.get("display_name"),
-            data.get("email"),
-            data.get("given_name"),
-            data.get("family_name"),
-            data.get("title"),
-            data.get("location"),
-            data.get("system_prompt"),
-            data.get("picture_url"),
-            data.get("tasks_number", 0),
-            data.get("chats_number", 0),
-            data.get("pdfs_number", 0),
-            user_id
-        ))
-        print(f"[UserRepository] Updated user {user_id} with data: {data}")
+    if not deltas:
+        return
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        psycopg2.extras.execute_values(
+            cursor, ADD_ACTIVITY_COUNTS_QUERY, deltas,
+            template="(%s, %s::INT, %s::INT, %s::INT)", page_size=len(deltas)
+        )
         conn.commit()
-    except Exception as e:
-        print(f"[UserRepository] Error updating user {user_id}: {e}")
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
-
-# ==================== INITIALIZE ====================
-if __name__ == "__main__":
-    create_table()
-    print("Users table created successfully!")
\ No newline at end of file
+    # Nothing on the chat path reads the counters, so cached identities are
+    # patched rather than invalidated
+    for google_id, chats, pdfs, tasks in deltas:
+        identity_cache.add_counts(google_id, {"chats_number": chats, "pdfs_number": pdfs, "tasks_number": tasks})
@@ -0,0 +1,277 @@
+"""
+Compact, memory-mapped vector files for the local memory tiers.
+
+A .pvec file holds unit-normalised vectors as float16, or as int8 with one
+float32 scale per vector (2x / ~4x smaller than Chroma's float32 copy), grouped
+by user so one user's rows are a contiguous slice. Searches go through
+np.memmap a chunk at a time, so only the pages a search touches are read.
+The ID table (chroma id, embedding_id, user_id per row, plus each user's row
+range) is JSON at the end of the same file, so replacing the file swaps
+vectors and IDs together.
+
+Layout: 64-byte header | vectors (count x dims, float16 or int8) | int8 only: scales (count x float32) | ID table
+
+From the backend directory:
+
+    python -m storage.vector_file convert db/chroma_short_term db/vectors/short_term.pvec --dtype int8
+    python -m storage.vector_file bench db/chroma_short_term          # recall@k vs float32
+    python -m storage.vector_file bench --synthetic 20000              # same, on random data
+"""
+import argparse
+import json
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+
+MAGIC = b"PVEC"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sHBxIQQ")   # magic, version, dtype code, dims, count, ID table bytes
+HEADER_SIZE = 64
+DTYPES = {"float16": 1, "int8": 2}
+DTYPE_NAMES = {code: name for name, code in DTYPES.items()}
+
+# Rows scored per step; bounds the float32 scratch space a search needs
+SEARCH_CHUNK_ROWS = 8192
+
+
+# ==================== WRITING ====================
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> tuple:
+    """(stored vectors, per-vector scales or None) for unit-normalised float32 rows"""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1, initial=0.0) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    raise ValueError(f"Unsupported dtype {dtype!r}; expected one of {sorted(DTYPES)}")
+
+
+def write_vector_file(path: str, ids: list, embedding_ids: list, user_ids: list, embeddings, dtype: str = "int8"):
+    """
+    Write a .pvec file. Rows are regrouped by user; rows without a user come
+    first and are only reachable by a whole-file search.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype!r}; expected one of {sorted(DTYPES)}")
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if ids:
+        vectors = _normalize(matrix.reshape(len(ids), -1))
+    else:
+        # An empty tier still gets a (header-only) file
+        vectors = np.empty((0, matrix.shape[1] if matrix.ndim == 2 else 0), dtype=np.float32)
+    order = sorted(range(len(ids)), key=lambda i: (user_ids[i] or "", i))
+    stored, scales = quantize(vectors[order], dtype)
+
+    users = {}
+    for row, i in enumerate(order):
+        if user_ids[i]:
+            start, _ = users.get(user_ids[i], (row, row))
+            users[user_ids[i]] = (start, row + 1)
+    table = json.dumps({
+        "ids": [ids[i] for i in order],
+        "embedding_ids": [embedding_ids[i] for i in order],
+        "user_ids": [user_ids[i] for i in order],
+        "users": users,
+    }).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, DTYPES[dtype], vectors.shape[1], len(ids), len(table)
+        ).ljust(HEADER_SIZE, b"\0"))
+        f.write(stored.tobytes())
+        if scales is not None:
+            f.write(scales.tobytes())
+        f.write(table)
+    os.replace(tmp_path, path)
+
+
+# ==================== READING ====================
+
+class VectorFile:
+    """Read-only view of a .pvec file; vectors stay on disk behind np.memmap"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, dtype_code, self.dims, self.count, table_bytes = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a version {FORMAT_VERSION} vector file")
+            self.dtype = DTYPE_NAMES[dtype_code]
+
+            item = np.dtype(np.float16 if self.dtype == "float16" else np.int8)
+            scales_offset = HEADER_SIZE + self.count * self.dims * item.itemsize
+            f.seek(scales_offset + (self.count * 4 if self.dtype == "int8" else 0))
+            table = json.loads(f.read(table_bytes))
+
+        self.vectors = np.memmap(path, dtype=item, mode="r", offset=HEADER_SIZE, shape=(self.count, self.dims)) \
+            if self.count else np.empty((0, self.dims), dtype=item)
+        self.scales = None
+        if self.dtype == "int8" and self.count:
+            self.scales = np.memmap(path, dtype=np.float32, mode="r", offset=scales_offset, shape=(self.count,))
+
+        self.ids = table["ids"]
+        self.embedding_ids = table["embedding_ids"]
+        self.user_ids = table["user_ids"]
+        self.users = {user_id: tuple(bounds) for user_id, bounds in table["users"].items()}
+
+    def _rows(self, user_id: str = None) -> tuple:
+        if user_id is None:
+            return 0, self.count
+        return self.users.get(user_id, (0, 0))
+
+    def search(self, query_embedding, k: int = 5, user_id: str = None) -> list:
+        """[(row, cosine similarity)] best first, over one user's rows or the whole file"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        start, end = self._rows(user_id)
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for chunk_start in range(start, end, SEARCH_CHUNK_ROWS):
+            chunk_end = min(chunk_start + SEARCH_CHUNK_ROWS, end)
+            scores = self.vectors[chunk_start:chunk_end].astype(np.float32) @ query
+            if self.scales is not None:
+                scores *= self.scales[chunk_start:chunk_end]
+            best_rows = np.concatenate([best_rows, np.arange(chunk_start, chunk_end)])
+            best_scores = np.concatenate([best_scores, scores])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores)
+        return [(int(best_rows[i]), float(best_scores[i])) for i in order]
+
+    def nbytes(self) -> int:
+        return os.path.getsize(self.path)
+
+
+# ==================== CONVERSION ====================
+
+def read_chroma_tier(persist_dir: str, page_size: int = 1000) -> tuple:
+    """(ids, embedding_ids, user_ids, float32 matrix) for every vector in a local Chroma directory"""
+    from langchain_chroma import Chroma
+
+    db = Chroma(persist_directory=persist_dir)
+    ids, embedding_ids, user_ids, embeddings = [], [], [], []
+    offset = 0
+    while True:
+        page = db.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+        if not page["ids"]:
+            break
+        for doc_id, metadata, embedding in zip(page["ids"], page["metadatas"], page["embeddings"]):
+            metadata = metadata or {}
+            ids.append(doc_id)
+            embedding_ids.append(metadata.get("embedding_id"))
+            user_ids.append(metadata.get("user_id"))
+            embeddings.append(embedding)
+        offset += len(page["ids"])
+    matrix = np.asarray(embeddings, dtype=np.float32) if embeddings else np.empty((0, 0), dtype=np.float32)
+    return ids, embedding_ids, user_ids, matrix
+
+
+def convert(persist_dir: str, path: str, dtype: str = "int8") -> VectorFile:
+    ids, embedding_ids, user_ids, matrix = read_chroma_tier(persist_dir)
+    write_vector_file(path, ids, embedding_ids, user_ids, matrix, dtype)
+    vector_file = VectorFile(path)
+    print(f"[VectorFile] {persist_dir} -> {path}: {len(ids)} vectors, {dtype}, {vector_file.nbytes():,} bytes")
+    return vector_file
+
+
+# ==================== BENCHMARK ====================
+
+def benchmark(matrix: np.ndarray, user_ids: list, queries: int = 200, k: int = 5, seed: int = 0) -> dict:
+    """
+    recall@k of each compact format against exact float32 search, per user
+    (how the memory tiers are queried). Queries are stored vectors plus noise,
+    so each has a near neighbour but isn't an exact copy of one.
+    """
+    rng = np.random.default_rng(seed)
+    exact = _normalize(matrix.astype(np.float32))
+    picks = rng.integers(0, len(exact), size=queries)
+    noise = rng.normal(scale=0.5 / np.sqrt(exact.shape[1]), size=(queries, exact.shape[1])).astype(np.float32)
+    query_vectors = _normalize(exact[picks] + noise)
+    ids = [str(i) for i in range(len(exact))]
+
+    results = {"vectors": len(exact), "dims": exact.shape[1], "queries": queries, "k": k,
+               "float32_bytes": exact.nbytes}
+    with tempfile.TemporaryDirectory() as directory:
+        for dtype in DTYPES:
+            path = os.path.join(directory, f"bench.{dtype}.pvec")
+            write_vector_file(path, ids, ids, user_ids, exact, dtype)
+            vector_file = VectorFile(path)
+
+            hits, elapsed = 0, 0.0
+            for query, pick in zip(query_vectors, picks):
+                user_id = user_ids[pick]
+                rows = [i for i, owner in enumerate(user_ids) if owner == user_id]
+                scores = exact[rows] @ query
+                truth = {ids[rows[i]] for i in np.argsort(-scores)[:k]}
+
+                started = time.perf_counter()
+                found = vector_file.search(query, k, user_id=user_id)
+                elapsed += time.perf_counter() - started
+                hits += len(truth & {vector_file.ids[row] for row, _ in found})
+
+            results[dtype] = {
+                "recall_at_k": hits / (queries * min(k, len(exact))),
+                "bytes": vector_file.nbytes(),
+                "avg_search_ms": 1000 * elapsed / queries,
+            }
+            del vector_file
+    return results
+
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact vector files for the memory tiers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser("convert", help="Write a .pvec file from a local Chroma directory")
+    convert_parser.add_argument("persist_dir")
+    convert_parser.add_argument("path")
+    convert_parser.add_argument("--dtype", default="int8", choices=sorted(DTYPES))
+
+    bench_parser = commands.add_parser("bench", help="recall@k of float16 / int8 against float32")
+    bench_parser.add_argument("persist_dir", nargs="?")
+    bench_parser.add_argument("--synthetic", type=int, default=0, help="Random vectors instead of a Chroma directory")
+    bench_parser.add_argument("--dims", type=int, default=1536)
+    bench_parser.add_argument("--users", type=int, default=50)
+    bench_parser.add_argument("--queries", type=int, default=200)
+    bench_parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert(args.persist_dir, args.path, args.dtype)
+        return
+
+    if args.synthetic:
+        rng = np.random.default_rng(1)
+        matrix = rng.normal(size=(args.synthetic, args.dims)).astype(np.float32)
+        user_ids = [f"user-{i % args.users}" for i in range(args.synthetic)]
+    elif args.persist_dir:
+        _, _, user_ids, matrix = read_chroma_tier(args.persist_dir)
+    else:
+        parser.error("bench needs a Chroma directory or --synthetic N")
+    if not len(matrix):
+        parser.error("no vectors to benchmark")
+    print(json.dumps(benchmark(matrix, user_ids, args.queries, args.k), indent=2))
+
+
+if __name__ == "__main__":
+    main()
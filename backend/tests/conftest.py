@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The backend runs with backend/ as the working directory and imports its
+# modules top-level (import metrics, from storage import ...); tests do the same.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
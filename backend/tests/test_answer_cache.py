@@ -0,0 +1,88 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from answer_cache import AnswerCache, context_fingerprint, history_key
+from storage import migrate
+
+
+QUERY = [1.0, 0.0, 0.0]
+NEAR_QUERY = [0.99, 0.05, 0.0]
+
+PROFILE = {"name": "Ada"}
+GOOGLE = {"events": ["Standup 9:00"], "tasks": []}
+
+HISTORY_A = [HumanMessage(content="plan my week"), AIMessage(content="Here is your week...")]
+HISTORY_B = [HumanMessage(content="what's the weather"), AIMessage(content="Sunny.")]
+
+
+def store(cache, history, reply="cached reply"):
+    cache.store("u1", QUERY, context_fingerprint(PROFILE, GOOGLE), history_key(history), reply, "LLM")
+
+
+def test_same_query_after_same_exchange_hits():
+    cache = AnswerCache()
+    store(cache, HISTORY_A)
+    hit = cache.lookup("u1", NEAR_QUERY, context_fingerprint(PROFILE, GOOGLE), history_key(HISTORY_A))
+    assert hit["reply"] == "cached reply"
+
+
+def test_follow_up_in_a_different_conversation_misses():
+    cache = AnswerCache()
+    store(cache, HISTORY_A)   # "yes" after the week plan ...
+    # ... must not answer "yes" after a weather question
+    assert cache.lookup("u1", QUERY, context_fingerprint(PROFILE, GOOGLE), history_key(HISTORY_B)) is None
+
+
+def test_history_mismatch_does_not_evict_other_entries():
+    cache = AnswerCache()
+    store(cache, HISTORY_A)
+    cache.lookup("u1", QUERY, context_fingerprint(PROFILE, GOOGLE), history_key(HISTORY_B))
+    assert cache.lookup("u1", QUERY, context_fingerprint(PROFILE, GOOGLE), history_key(HISTORY_A)) is not None
+
+
+def test_changed_context_misses_and_drops_stale_entries():
+    cache = AnswerCache()
+    store(cache, HISTORY_A)
+    changed = context_fingerprint(PROFILE, {"events": ["Standup 10:00"], "tasks": []})
+    assert cache.lookup("u1", QUERY, changed, history_key(HISTORY_A)) is None
+    assert cache.lookup("u1", QUERY, context_fingerprint(PROFILE, GOOGLE), history_key(HISTORY_A)) is None
+
+
+def test_history_key_only_looks_at_the_last_exchange():
+    older = [HumanMessage(content="hi"), AIMessage(content="hello")]
+    assert history_key(older + HISTORY_A) == history_key(HISTORY_A)
+    assert history_key(HISTORY_A) != history_key(HISTORY_B)
+    assert history_key([]) == history_key([])
+
+
+def test_other_users_entries_never_match():
+    cache = AnswerCache()
+    store(cache, HISTORY_A)
+    assert cache.lookup("u2", QUERY, context_fingerprint(PROFILE, GOOGLE), history_key(HISTORY_A)) is None
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "db" / "memory.db")
+    migrate.migrate_sqlite(path)
+    return path
+
+
+def test_invalidation_reaches_other_workers(db_path):
+    worker_a, worker_b = AnswerCache(db_path=db_path), AnswerCache(db_path=db_path)
+    version = worker_b.version("u1")
+    assert version == 0
+    fingerprint = context_fingerprint(PROFILE, GOOGLE, version)
+    worker_b.store("u1", QUERY, fingerprint, history_key(HISTORY_A), "cached reply", "LLM")
+
+    worker_a.invalidate_user("u1")   # e.g. an upload handled by another worker
+
+    version = worker_b.version("u1")
+    assert version == 1 and worker_b.version("u2") == 0
+    assert worker_b.lookup("u1", QUERY, context_fingerprint(PROFILE, GOOGLE, version), history_key(HISTORY_A)) is None
+
+
+def test_unreadable_version_skips_the_cache(tmp_path):
+    cache = AnswerCache(db_path=str(tmp_path / "db" / "unmigrated.db"))
+    assert cache.version("u1") is None
+    cache.invalidate_user("u1")   # logged, doesn't raise
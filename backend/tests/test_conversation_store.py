@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from storage import conversation_store as conversation_store_module
+from storage import migrate
+from storage.conversation_store import ConversationStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "db" / "memory.db")
+    migrate.migrate_sqlite(path)
+    return path
+
+
+def contents(messages):
+    return [message.content for message in messages]
+
+
+def test_anonymous_requests_keep_no_history(db_path):
+    store = ConversationStore(db_path=db_path)
+    assert store.append_turn(None, "hi", "hello") == 0
+    assert store.get_history(None) == []
+
+
+def test_other_workers_appends_are_picked_up(db_path):
+    reader, writer = ConversationStore(db_path=db_path), ConversationStore(db_path=db_path)
+    writer.append_turn("u1", "q1", "a1")
+    assert contents(reader.get_history("u1")) == ["q1", "a1"]
+
+    writer.append_turn("u1", "q2", "a2")
+    assert contents(reader.get_history("u1", 3)) == ["a1", "q2", "a2"]
+
+
+def test_window_keeps_the_newest_messages(db_path):
+    store = ConversationStore(db_path=db_path, window=4)
+    for i in range(3):
+        store.append_turn("u1", f"q{i}", f"a{i}")
+    assert contents(ConversationStore(db_path=db_path, window=4).get_history("u1")) == ["q1", "a1", "q2", "a2"]
+    assert contents(store.get_history("u1")) == ["q1", "a1", "q2", "a2"]
+
+
+def test_concurrent_top_ups_dont_duplicate_messages(db_path, monkeypatch):
+    to_message = conversation_store_module._to_message
+
+    def slow_to_message(role, content):
+        time.sleep(0.001)   # widens the window between reading the buffer and updating it
+        return to_message(role, content)
+
+    monkeypatch.setattr(conversation_store_module, "_to_message", slow_to_message)
+    for trial in range(20):
+        user_id = f"u{trial}"
+        reader, writer = ConversationStore(db_path=db_path), ConversationStore(db_path=db_path)
+        reader.get_history(user_id)            # caches an empty buffer
+        writer.append_turn(user_id, "q", "a")  # written by another worker
+
+        barrier = threading.Barrier(4)
+        results = []
+
+        def read():
+            barrier.wait()
+            results.append(contents(reader.get_history(user_id)))
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [["q", "a"]] * 4
+        assert contents(reader.get_history(user_id)) == ["q", "a"]
@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+import pytest
+
+import embedding_cache
+from embedding_cache import CachedEmbeddings
+from storage import migrate
+
+
+class FakeProvider:
+    """Deterministic vectors; records every text it was asked to embed"""
+
+    model = "fake-embedding"
+    dimensions = 3
+
+    def __init__(self):
+        self.calls = []
+
+    def _vector(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls.append([text])
+        return self._vector(text)
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "db" / "memory.db")
+    migrate.migrate_sqlite(path)
+    return path
+
+
+def test_misses_go_to_the_provider_once_deduplicated(db_path):
+    provider = FakeProvider()
+    cache = CachedEmbeddings(provider, db_path=db_path)
+
+    first = cache.embed_documents(["a", "bb", "a"])
+    assert provider.calls == [["a", "bb"]]
+    assert first[0] == first[2] == provider._vector("a")
+
+    assert cache.embed_documents(["bb", "a"]) == [provider._vector("bb"), provider._vector("a")]
+    assert cache.embed_query("a") == provider._vector("a")
+    assert provider.calls == [["a", "bb"]]
+
+
+def test_disk_tier_survives_a_new_process(db_path):
+    CachedEmbeddings(FakeProvider(), db_path=db_path).embed_documents(["hello"])
+
+    provider = FakeProvider()
+    cache = CachedEmbeddings(provider, db_path=db_path)
+    assert cache.embed_query("hello") == provider._vector("hello")
+    assert provider.calls == []
+
+
+def test_other_model_or_dimensions_miss(db_path):
+    CachedEmbeddings(FakeProvider(), db_path=db_path).embed_query("hello")
+
+    provider = FakeProvider()
+    provider.dimensions = 2
+    CachedEmbeddings(provider, db_path=db_path).embed_query("hello")
+    assert provider.calls == [["hello"]]
+
+
+def test_lru_evicts_the_coldest_entry(db_path):
+    cache = CachedEmbeddings(FakeProvider(), db_path=db_path, lru_size=2)
+    cache.embed_documents(["a", "b"])
+    cache.embed_query("a")    # b is now the coldest
+    cache.embed_query("c")
+
+    assert list(cache._lru) == [cache._hash("a"), cache._hash("c")]
+
+
+def test_async_paths_hit_and_miss(db_path):
+    provider = FakeProvider()
+    cache = CachedEmbeddings(provider, db_path=db_path)
+
+    async def scenario():
+        first = await cache.aembed_query("q")
+        again = await cache.aembed_query("q")
+        documents = await cache.aembed_documents(["q", "r"])
+        return first, again, documents
+
+    first, again, documents = asyncio.run(scenario())
+    assert first == again == provider._vector("q")
+    assert documents == [provider._vector("q"), provider._vector("r")]
+    assert provider.calls == [["q"], ["r"]]
+
+
+def test_unusable_table_only_costs_the_cache(tmp_path):
+    provider = FakeProvider()
+    cache = CachedEmbeddings(provider, db_path=str(tmp_path / "db" / "unmigrated.db"))
+
+    assert cache.embed_query("x") == provider._vector("x")
+    cache._lru.clear()
+    assert cache.embed_query("x") == provider._vector("x")
+    assert provider.calls == [["x"], ["x"]]
+
+
+def disk_rows(cache):
+    with cache._db_lock:
+        return cache._connection().execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+
+def test_disk_tier_is_capped_least_recently_used_first(db_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_PRUNE_EVERY", 1)
+    provider = FakeProvider()
+    cache = CachedEmbeddings(provider, db_path=db_path, max_rows=2)
+
+    cache.embed_query("a")
+    time.sleep(0.01)
+    cache.embed_query("b")
+    time.sleep(0.01)
+    cache._lru.clear()
+    cache.embed_query("a")   # disk hit: a is now more recent than b
+    time.sleep(0.01)
+    cache.embed_query("c")   # over the cap: b goes
+
+    assert disk_rows(cache) == 2
+    cache._lru.clear()
+    provider.calls.clear()
+    cache.embed_documents(["a", "b", "c"])
+    assert provider.calls == [["b"]]
@@ -0,0 +1,39 @@
+from storage.identity_cache import IdentityCache
+
+
+def identity(chats=0):
+    return {"user": {"id": 1, "chats_number": chats, "pdfs_number": None}, "tokens": None, "profile": {}}
+
+
+def test_counter_deltas_patch_the_cached_identity():
+    cache = IdentityCache()
+    _, _, version = cache.get("g1")
+    cache.put("g1", identity(chats=2), version)
+    _, before, _ = cache.get("g1")
+
+    cache.add_counts("g1", {"chats_number": 3, "pdfs_number": 1})
+
+    hit, after, _ = cache.get("g1")
+    assert hit
+    assert (after["user"]["chats_number"], after["user"]["pdfs_number"]) == (5, 1)
+    assert before["user"]["chats_number"] == 2   # dicts already handed out aren't changed
+
+
+def test_counter_deltas_dont_invalidate_other_users():
+    cache = IdentityCache()
+    _, _, version = cache.get("g2")   # a read in flight for another user
+
+    cache.add_counts("g1", {"chats_number": 1})   # not cached: nothing to patch
+    cache.put("g2", identity(), version)
+
+    assert cache.get("g1")[0] is False
+    assert cache.get("g2")[0] is True
+
+
+def test_profile_writes_still_invalidate():
+    cache = IdentityCache()
+    _, _, version = cache.get("g1")
+    cache.put("g1", identity(), version)
+
+    cache.invalidate("g1")
+    assert cache.get("g1")[0] is False
@@ -0,0 +1,83 @@
+import pytest
+
+from storage import job_queue as job_queue_module
+from storage import migrate
+from storage.job_queue import JobQueue, JOB_LEASE_SECONDS
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_queue_module.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    db_path = str(tmp_path / "db" / "memory.db")
+    migrate.migrate_sqlite(db_path)
+    return JobQueue(db_path=db_path, workers=1, max_attempts=3)
+
+
+def job_row(queue, job_id):
+    conn = queue._connect()
+    try:
+        return conn.execute("SELECT status, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def test_claim_counts_an_attempt(queue):
+    job_id = queue.enqueue("summarize_conversation", "u1", {"history": []})
+    job = queue._claim()
+    assert job["id"] == job_id
+    assert job["attempts"] == 1
+    assert job_row(queue, job_id) == ("running", 1)
+
+
+def test_failure_backs_off_then_fails_for_good(queue, clock):
+    job_id = queue.enqueue("k", "u1")
+    for attempt in range(1, 4):
+        job = queue._claim()
+        assert job["attempts"] == attempt
+        queue._finish(job, "boom")
+        clock.now += 3600   # past any backoff
+    assert job_row(queue, job_id) == ("failed", 3)
+    assert queue._claim() is None
+
+
+def test_expired_lease_is_reclaimed_and_counted(queue, clock):
+    job_id = queue.enqueue("k", "u1")
+    queue._claim()                           # worker dies holding the lease
+    assert queue._claim() is None            # still leased
+    clock.now += JOB_LEASE_SECONDS + 1
+    job = queue._claim()
+    assert job["id"] == job_id and job["attempts"] == 2
+
+
+def test_job_that_keeps_crashing_its_worker_stops_at_max_attempts(queue, clock):
+    job_id = queue.enqueue("k", "u1")
+    for _ in range(3):
+        assert queue._claim() is not None    # each claim's worker crashes
+        clock.now += JOB_LEASE_SECONDS + 1
+    assert queue._claim() is None
+    assert job_row(queue, job_id) == ("failed", 3)
+
+
+def test_jobs_for_one_user_run_in_order(queue):
+    first = queue.enqueue("k", "u1")
+    second = queue.enqueue("k", "u1")
+    other = queue.enqueue("k", "u2")
+    assert queue._claim()["id"] == first
+    assert queue._claim()["id"] == other     # u1's second job waits for the first
+    assert queue._claim() is None
+    queue._finish({"id": first, "attempts": 1})
+    assert queue._claim()["id"] == second
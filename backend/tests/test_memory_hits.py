@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from storage import memory_manager
+from storage import migrate
+from storage.memory_manager import MemoryDB, MemoryHitBuffer
+
+
+@pytest.fixture
+def memory_db(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "db" / "memory.db")
+    migrate.migrate_sqlite(db_path)
+    db = MemoryDB(db_path)
+    monkeypatch.setattr(memory_manager, "memory_db", db)
+    yield db
+    db.close()
+
+
+def add_memory(db, embedding_id, tier="short", frequency=1, days_ago=0):
+    with db.connection() as conn:
+        conn.execute("""
+            INSERT INTO memories (user_id, content, embedding_id, tier, location, frequency, last_accessed)
+            VALUES ('u1', 'note', ?, ?, ?, ?, datetime('now', ?))
+        """, (embedding_id, tier, tier, frequency, f"-{days_ago} days"))
+        conn.commit()
+
+
+def memory_row(db, embedding_id):
+    with db.connection() as conn:
+        return conn.execute(
+            "SELECT tier, frequency FROM memories WHERE embedding_id = ?", (embedding_id,)
+        ).fetchone()
+
+
+def test_flush_sums_hits_per_memory(memory_db):
+    add_memory(memory_db, "m1")
+    add_memory(memory_db, "m2")
+    hits = MemoryHitBuffer(batch_size=100)
+
+    hits.record(["m1", "m2", None])
+    hits.record(["m1"])
+
+    assert hits.flush() == 2
+    assert memory_row(memory_db, "m1") == ("short", 3)
+    assert memory_row(memory_db, "m2") == ("short", 2)
+    assert hits.flush() == 0
+
+
+def test_flush_promotes_long_term_hits(memory_db, monkeypatch):
+    moves = []
+    monkeypatch.setattr(memory_manager.memory_demotion, "request_move", lambda: moves.append(True))
+    add_memory(memory_db, "old", tier="long", days_ago=400)
+    add_memory(memory_db, "recent", tier="short")
+    hits = MemoryHitBuffer(batch_size=100)
+
+    hits.record(["old", "recent"])
+    hits.flush()
+
+    # The hit itself makes the memory recent again, so it clears SHORT_TERM_THRESHOLD
+    assert memory_row(memory_db, "old") == ("short", 2)
+    assert memory_row(memory_db, "recent") == ("short", 2)
+    assert moves   # the vector move itself is left to the demotion scheduler
+
+
+def test_failed_flush_keeps_hits_for_the_next_one(memory_db, monkeypatch):
+    add_memory(memory_db, "m1")
+    hits = MemoryHitBuffer(batch_size=100)
+    hits.record(["m1"])
+
+    with monkeypatch.context() as broken:
+        broken.setattr(memory_manager, "BUMP_HITS_QUERY", "UPDATE no_such_table SET x = ? WHERE y = ? AND z = ?")
+        assert hits.flush() == 0
+    assert memory_row(memory_db, "m1") == ("short", 1)
+
+    assert hits.flush() == 1
+    assert memory_row(memory_db, "m1") == ("short", 2)
+
+
+def test_full_batch_wakes_the_flusher_instead_of_flushing_inline(memory_db):
+    add_memory(memory_db, "m1")
+    hits = MemoryHitBuffer(flush_seconds=3600, batch_size=2)
+
+    async def scenario():
+        hits.start()
+        try:
+            hits.record(["m1", "m1"])
+            assert memory_row(memory_db, "m1") == ("short", 1)   # nothing written on the caller's stack
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if memory_row(memory_db, "m1")[1] == 3:
+                    break
+        finally:
+            await hits.stop()
+
+    asyncio.run(scenario())
+    assert memory_row(memory_db, "m1") == ("short", 3)
@@ -0,0 +1,75 @@
+import threading
+
+from langchain_core.documents import Document
+
+import metrics
+from storage.memory_index import TierVectors, UserVectorIndex
+
+
+def tiers_for(user_id):
+    documents = [Document(page_content=f"{user_id} a"), Document(page_content=f"{user_id} b")]
+    return {"short": TierVectors([[1.0, 0.0], [0.0, 1.0]], documents, relevance=lambda similarities: similarities)}
+
+
+class BlockingLoader:
+    """Loader that holds the first load open until released, to race invalidations against it"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.loads = []
+
+    def __call__(self, user_id):
+        self.loads.append(user_id)
+        self.started.set()
+        self.release.wait(5)
+        return tiers_for(user_id)
+
+
+def search_in_thread(index, user_id):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(index.search(user_id, "short", [1.0, 0.0], 1)))
+    thread.start()
+    return thread, results
+
+
+def test_a_miss_is_counted_once():
+    index = UserVectorIndex(tiers_for)
+    misses, hits = metrics.get_counter("memory_index.miss"), metrics.get_counter("memory_index.hit")
+
+    assert index.search("u1", "short", [1.0, 0.0], 1)[0][0].page_content == "u1 a"
+    index.search("u1", "short", [0.0, 1.0], 1)
+
+    assert metrics.get_counter("memory_index.miss") - misses == 1
+    assert metrics.get_counter("memory_index.hit") - hits == 1
+
+
+def test_writes_for_other_users_dont_discard_a_load():
+    loader = BlockingLoader()
+    index = UserVectorIndex(loader)
+    thread, results = search_in_thread(index, "u1")
+    loader.started.wait(5)
+
+    index.invalidate("u2")
+    loader.release.set()
+    thread.join(5)
+
+    assert results[0]
+    assert index.stats()["users"] == 1
+    index.search("u1", "short", [1.0, 0.0], 1)
+    assert loader.loads == ["u1"]
+
+
+def test_a_write_during_the_load_discards_it():
+    loader = BlockingLoader()
+    index = UserVectorIndex(loader)
+    thread, results = search_in_thread(index, "u1")
+    loader.started.wait(5)
+
+    index.invalidate("u1")
+    loader.release.set()
+    thread.join(5)
+
+    assert results[0]   # still answers the search that loaded it
+    assert index.stats()["users"] == 0
+    assert index._versions == {} and index._loads == {}
@@ -0,0 +1,121 @@
+import pytest
+
+from storage import memory_manager
+from storage import migrate
+from storage.memory_manager import MemoryDB, move_tier_vectors, SHORT_TERM_DIR, LONG_TERM_DIR
+
+
+class FakeTiers:
+    """memory_store stand-in: persist_dir -> {chroma id: (embedding, document, metadata)}"""
+
+    def __init__(self):
+        self.tiers = {SHORT_TERM_DIR: {}, LONG_TERM_DIR: {}}
+        self.fail_delete = False
+
+    def add(self, persist_dir, doc_id, metadata):
+        self.tiers[persist_dir][doc_id] = ([0.1, 0.2], "note", metadata)
+
+    def holds(self, persist_dir, embedding_id):
+        return embedding_id in self.tiers[persist_dir]
+
+    def get_vectors(self, persist_dir, embedding_ids):
+        rows = [(doc_id, row) for doc_id, row in self.tiers[persist_dir].items() if doc_id in embedding_ids]
+        return {
+            "ids": [doc_id for doc_id, _ in rows],
+            "embeddings": [row[0] for _, row in rows],
+            "documents": [row[1] for _, row in rows],
+            "metadatas": [row[2] for _, row in rows],
+        }
+
+    def upsert_vectors(self, persist_dir, ids, embeddings, documents, metadatas):
+        for doc_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            self.tiers[persist_dir][doc_id] = (embedding, document, metadata)
+
+    def delete_vectors(self, persist_dir, embedding_ids):
+        if self.fail_delete:
+            raise RuntimeError("crash between copy and delete")
+        for embedding_id in embedding_ids:
+            self.tiers[persist_dir].pop(embedding_id, None)
+
+
+class NoIndex:
+    def invalidate(self, user_id):
+        pass
+
+
+@pytest.fixture
+def memory_db(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "db" / "memory.db")
+    migrate.migrate_sqlite(db_path)
+    db = MemoryDB(db_path)
+    monkeypatch.setattr(memory_manager, "memory_db", db)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def tiers(monkeypatch):
+    tiers = FakeTiers()
+    monkeypatch.setattr(memory_manager, "memory_store", tiers)
+    monkeypatch.setattr(memory_manager, "memory_index", NoIndex())
+    return tiers
+
+
+def add_memory(db, embedding_id, tier, location):
+    with db.connection() as conn:
+        conn.execute("""
+            INSERT INTO memories (user_id, content, embedding_id, tier, location)
+            VALUES ('u1', 'note', ?, ?, ?)
+        """, (embedding_id, tier, location))
+        conn.commit()
+
+
+def location(db, embedding_id):
+    with db.connection() as conn:
+        return conn.execute("SELECT location FROM memories WHERE embedding_id = ?", (embedding_id,)).fetchone()[0]
+
+
+def test_moves_vectors_to_their_tier(memory_db, tiers):
+    add_memory(memory_db, "m1", tier="long", location="short")
+    tiers.add(SHORT_TERM_DIR, "m1", {"embedding_id": "m1", "user_id": "u1", "tier": "short"})
+
+    assert move_tier_vectors() == 1
+    assert location(memory_db, "m1") == "long"
+    assert not tiers.holds(SHORT_TERM_DIR, "m1")
+    assert tiers.tiers[LONG_TERM_DIR]["m1"][2]["tier"] == "long"
+
+
+def test_crash_after_copy_is_finished_by_the_next_pass(memory_db, tiers):
+    add_memory(memory_db, "m1", tier="long", location="short")
+    tiers.add(SHORT_TERM_DIR, "m1", {"embedding_id": "m1", "user_id": "u1", "tier": "short"})
+
+    tiers.fail_delete = True
+    with pytest.raises(RuntimeError):
+        move_tier_vectors()
+    assert location(memory_db, "m1") == "short"
+    assert tiers.holds(SHORT_TERM_DIR, "m1") and tiers.holds(LONG_TERM_DIR, "m1")
+
+    tiers.fail_delete = False
+    assert move_tier_vectors() == 1
+    assert location(memory_db, "m1") == "long"
+    assert not tiers.holds(SHORT_TERM_DIR, "m1") and tiers.holds(LONG_TERM_DIR, "m1")
+
+
+def test_crash_after_delete_only_marks_the_row(memory_db, tiers):
+    add_memory(memory_db, "m1", tier="long", location="short")
+    tiers.add(LONG_TERM_DIR, "m1", {"embedding_id": "m1", "user_id": "u1", "tier": "long"})
+
+    assert move_tier_vectors() == 1
+    assert location(memory_db, "m1") == "long"
+    assert tiers.holds(LONG_TERM_DIR, "m1")
+
+
+def test_vector_without_metadata_or_in_neither_tier_is_settled(memory_db, tiers):
+    add_memory(memory_db, "bare", tier="long", location="short")
+    add_memory(memory_db, "lost", tier="long", location="short")
+    tiers.add(SHORT_TERM_DIR, "bare", None)
+
+    assert move_tier_vectors() == 2
+    assert location(memory_db, "bare") == "long"
+    assert location(memory_db, "lost") == "long"
+    assert tiers.holds(LONG_TERM_DIR, "bare")
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from storage.vector_file import VectorFile, write_vector_file
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    user_ids = ["u2", "u1", None, "u2", "u1", "u1"]
+    ids = [f"doc-{i}" for i in range(len(user_ids))]
+    embedding_ids = [f"emb-{i}" for i in range(len(user_ids))]
+    return ids, embedding_ids, user_ids, rng.normal(size=(len(user_ids), 16)).astype(np.float32)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_round_trip(tmp_path, rows, dtype):
+    ids, embedding_ids, user_ids, matrix = rows
+    path = str(tmp_path / "tier.pvec")
+    write_vector_file(path, ids, embedding_ids, user_ids, matrix, dtype)
+    vector_file = VectorFile(path)
+
+    assert (vector_file.count, vector_file.dims, vector_file.dtype) == (6, 16, dtype)
+    assert sorted(vector_file.ids) == sorted(ids)
+    for row, doc_id in enumerate(vector_file.ids):
+        i = ids.index(doc_id)
+        assert vector_file.embedding_ids[row] == embedding_ids[i]
+        assert vector_file.user_ids[row] == user_ids[i]
+
+    # Each stored vector finds itself, within its user's rows
+    for i, doc_id in enumerate(ids):
+        found = vector_file.search(matrix[i], k=1, user_id=user_ids[i])
+        if user_ids[i] is None:
+            assert found[0][0] == vector_file.ids.index(doc_id)   # whole-file search
+        else:
+            row, score = found[0]
+            assert vector_file.ids[row] == doc_id
+            assert score == pytest.approx(1.0, abs=0.02)
+
+
+def test_users_are_contiguous_and_unowned_rows_have_no_range(tmp_path, rows):
+    ids, embedding_ids, user_ids, matrix = rows
+    path = str(tmp_path / "tier.pvec")
+    write_vector_file(path, ids, embedding_ids, user_ids, matrix)
+    vector_file = VectorFile(path)
+
+    assert set(vector_file.users) == {"u1", "u2"}
+    start, end = vector_file.users["u1"]
+    assert vector_file.user_ids[start:end] == ["u1"] * 3
+    assert len(vector_file.search(matrix[0], k=10, user_id="u2")) == 2
+    assert vector_file.search(matrix[0], k=10, user_id="nobody") == []
+
+
+def test_empty_tier_writes_a_header_only_file(tmp_path):
+    path = str(tmp_path / "empty.pvec")
+    write_vector_file(path, [], [], [], np.empty((0, 0), dtype=np.float32))
+    vector_file = VectorFile(path)
+
+    assert vector_file.count == 0
+    assert vector_file.ids == [] and vector_file.users == {}
+    assert vector_file.search([1.0, 0.0], k=5) == []
+
+
+def test_rewrite_replaces_vectors_and_ids_together(tmp_path, rows):
+    ids, embedding_ids, user_ids, matrix = rows
+    path = str(tmp_path / "tier.pvec")
+    write_vector_file(path, ids, embedding_ids, user_ids, matrix)
+    write_vector_file(path, ids[:2], embedding_ids[:2], user_ids[:2], matrix[:2])
+
+    vector_file = VectorFile(path)
+    assert vector_file.count == len(vector_file.ids) == 2
+    assert [p.name for p in tmp_path.iterdir()] == ["tier.pvec"]
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+
+import metrics
+from google_client import google_client, TOKEN_URL
+from storage import async_token_repository
+from storage import async_user_repository
+
+
+# Handlers refresh on the spot when the token has less than this left
+TOKEN_REFRESH_MARGIN_SECONDS   = int(os.getenv("TOKEN_REFRESH_MARGIN_SECONDS", "60"))
+# The scheduler refreshes tokens expiring within this window, well ahead of the handlers
+TOKEN_REFRESH_AHEAD_SECONDS    = int(os.getenv("TOKEN_REFRESH_AHEAD_SECONDS", "300"))
+TOKEN_REFRESH_INTERVAL_SECONDS = float(os.getenv("TOKEN_REFRESH_INTERVAL_SECONDS", "60"))
+TOKEN_REFRESH_BATCH_SIZE       = int(os.getenv("TOKEN_REFRESH_BATCH_SIZE", "50"))
+TOKEN_REFRESH_CONCURRENCY      = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "5"))
+TOKEN_REFRESH_RATE_PER_SECOND  = float(os.getenv("TOKEN_REFRESH_RATE_PER_SECOND", "10"))
+# A failed refresh isn't retried by the scheduler for this long
+TOKEN_REFRESH_RETRY_SECONDS    = int(os.getenv("TOKEN_REFRESH_RETRY_SECONDS", "30"))
+# Claimed rows are skipped by other workers' schedulers for this long (or until refreshed)
+TOKEN_REFRESH_LEASE_SECONDS    = int(os.getenv("TOKEN_REFRESH_LEASE_SECONDS", "120"))
+# Only keep tokens warm for users whose login cookie can still be valid
+TOKEN_REFRESH_SESSION_SECONDS  = int(os.getenv("TOKEN_REFRESH_SESSION_SECONDS", str(7 * 24 * 3600)))
+
+
+class TokenRefresher:
+    """
+    Keeps Google access tokens fresh.
+    A background loop refreshes tokens shortly before they expire, in batches
+    and under a rate limit. Handlers call get_valid_tokens(), which refreshes
+    a nearly-expired token on the spot; either way there is at most one
+    refresh in flight per user and everyone else waits on it. Across workers,
+    the scheduler claims its batch in Postgres, so each row is refreshed once.
+    """
+
+    def __init__(self):
+        self._in_flight = {}     # user_id -> asyncio.Task
+        self._task = None
+        self._rate_lock = None
+        self._next_slot = 0.0
+
+    # ==================== HANDLER SIDE ====================
+
+    async def get_valid_tokens(self, user_id: str):
+        """
+        The user's identity (async_user_repository.get_identity()) with an access token
+        that isn't about to expire, or None if they have no tokens. If a refresh
+        is already running for the user, waits for it instead of returning the old token.
+        """
+        if user_id in self._in_flight:
+            await self._join(user_id)
+
+        user_data = await async_user_repository.get_identity(user_id)
+        tokens = user_data["tokens"]
+        if not tokens:
+            return None
+        if not tokens.get("refresh_token") or not self._expires_within(tokens.get("expires_at"), TOKEN_REFRESH_MARGIN_SECONDS):
+            return user_data
+
+        if await self._join(user_id, tokens["refresh_token"]):
+            metrics.increment("oauth.refresh.on_demand")
+            return await async_user_repository.get_identity(user_id)
+        # Refresh failed; the old token may still have a few seconds left
+        return user_data
+
+    @staticmethod
+    def _expires_within(expires_at, seconds: int) -> bool:
+        if expires_at is None:
+            return False
+        return expires_at - datetime.now(timezone.utc) < timedelta(seconds=seconds)
+
+    # ==================== REFRESH ====================
+
+    async def _join(self, user_id: str, refresh_token: str = None) -> bool:
+        """Wait on the user's refresh, starting one if needed. Returns True on success."""
+        task = self._in_flight.get(user_id)
+        if task is None:
+            if refresh_token is None:
+                return False
+            task = asyncio.create_task(self._refresh(user_id, refresh_token))
+            self._in_flight[user_id] = task
+        else:
+            metrics.increment("oauth.refresh.shared")
+        # Shielded so a cancelled request doesn't abort the refresh others are waiting on
+        return await asyncio.shield(task)
+
+    async def _rate_limit(self):
+        async with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + 1.0 / TOKEN_REFRESH_RATE_PER_SECOND
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _refresh(self, user_id: str, refresh_token: str) -> bool:
+        try:
+            if self._rate_lock is None:
+                self._rate_lock = asyncio.Lock()
+            await self._rate_limit()
+
+            started = time.monotonic()
+            try:
+                status, body = await google_client.request("POST", TOKEN_URL, data={
+                    "client_id": os.getenv("CLIENT_ID"),
+                    "client_secret": os.getenv("CLIENT_SECRET"),
+                    "refresh_token": refresh_token,
+                    "grant_type": "refresh_token",
+                })
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"[TokenRefresh] Request failed for user {user_id}: {e}")
+                return await self._failed(user_id)
+            metrics.observe("oauth.refresh.seconds", time.monotonic() - started)
+
+            try:
+                token_data = json.loads(body)
+            except ValueError:
+                token_data = {}
+
+            if status == 200 and "access_token" in token_data:
+                await async_token_repository.update_refreshed_tokens(user_id, token_data)
+                metrics.increment("oauth.refresh.succeeded")
+                return True
+
+            if token_data.get("error") == "invalid_grant":
+                # Revoked or expired refresh token — only a new login fixes this
+                print(f"[TokenRefresh] Refresh token for user {user_id} is no longer valid")
+                await async_token_repository.clear_refresh_token(user_id)
+                metrics.increment("oauth.refresh.revoked")
+                return False
+
+            print(f"[TokenRefresh] Refresh failed for user {user_id} ({status}): {body[:200]}")
+            return await self._failed(user_id)
+        except Exception as e:
+            print(f"[TokenRefresh] Error refreshing user {user_id}: {e}")
+            return await self._failed(user_id)
+        finally:
+            self._in_flight.pop(user_id, None)
+
+    async def _failed(self, user_id: str) -> bool:
+        metrics.increment("oauth.refresh.failed")
+        try:
+            await async_token_repository.record_refresh_failure(user_id, TOKEN_REFRESH_RETRY_SECONDS)
+        except Exception as e:
+            # The lease still runs out, so the scheduler picks the user up again later
+            print(f"[TokenRefresh] Could not record failed refresh for user {user_id}: {e}")
+        return False
+
+    # ==================== SCHEDULER ====================
+
+    async def refresh_due(self) -> int:
+        """Claim and refresh one batch of tokens that are about to expire. Returns how many were attempted."""
+        due = await async_token_repository.claim_expiring_tokens(
+            TOKEN_REFRESH_AHEAD_SECONDS, TOKEN_REFRESH_SESSION_SECONDS, TOKEN_REFRESH_BATCH_SIZE,
+            TOKEN_REFRESH_LEASE_SECONDS,
+        )
+        if not due:
+            return 0
+
+        semaphore = asyncio.Semaphore(TOKEN_REFRESH_CONCURRENCY)
+
+        async def refresh_one(row):
+            async with semaphore:
+                await self._join(row["user_id"], row["refresh_token"])
+
+        await asyncio.gather(*[refresh_one(row) for row in due])
+        metrics.increment("oauth.refresh.scheduled", len(due))
+        print(f"[TokenRefresh] Refreshed batch of {len(due)} token(s)")
+        return len(due)
+
+    async def _run(self):
+        while True:
+            try:
+                attempted = await self.refresh_due()
+            except Exception as e:
+                print(f"[TokenRefresh] Batch failed: {e}")
+                attempted = 0
+            # A full batch means there is probably more waiting
+            if attempted < TOKEN_REFRESH_BATCH_SIZE:
+                await asyncio.sleep(TOKEN_REFRESH_INTERVAL_SECONDS)
+
+    def start(self):
+        """Spawn the scheduler on the running event loop (call from app startup)"""
+        self._rate_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+        print("[TokenRefresh] Scheduler started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+
+
+token_refresher = TokenRefresher()
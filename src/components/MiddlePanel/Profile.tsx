@@ -67,9 +67,6 @@ export function ProfilePanel() {
           title: form.title,
           location: form.location,
           system_prompt: form.system_prompt,
-          chats_number: form.chat_number,
-          tasks_number: form.task_number,
-          pdfs_number: form.pdf_number,
           picture_url: form.picture_url
         })
       });
@@ -39,7 +39,7 @@ export function GoogleDataProvider({ children }: { children: React.ReactNode })
   const [loading, setLoading] = useState(true);
   const [trackedUserId, setTrackedUserId] = useState<string | null>(null);
 
-  async function fetchAll() {
+  async function fetchAll(forceRefresh = false) {
     setLoading(true);
     try {
       // Get user_id from localStorage
@@ -55,12 +55,15 @@ export function GoogleDataProvider({ children }: { children: React.ReactNode })
         console.log('No user_id in localStorage yet');
       }
 
+      // The backend caches Google data briefly; an explicit refresh bypasses it
+      const query = forceRefresh ? "?refresh=true" : "";
+
       const [eventsRes, tasksRes] = await Promise.all([
-        fetch(`${import.meta.env.VITE_BACKEND_URL}/events`, { 
+        fetch(`${import.meta.env.VITE_BACKEND_URL}/events${query}`, { 
           credentials: "include",
           headers 
         }),
-        fetch(`${import.meta.env.VITE_BACKEND_URL}/tasks`, { 
+        fetch(`${import.meta.env.VITE_BACKEND_URL}/tasks${query}`, { 
           credentials: "include",
           headers 
         }),
@@ -126,7 +129,7 @@ export function GoogleDataProvider({ children }: { children: React.ReactNode })
 
   return (
     <GoogleDataContext.Provider
-      value={{ agenda, todayAgenda, tasks, connected, loading, refresh: fetchAll }}
+      value={{ agenda, todayAgenda, tasks, connected, loading, refresh: () => fetchAll(true) }}
     >
       {children}
     </GoogleDataContext.Provider>